@@ -1,20 +1,24 @@
 import streamlit as st
-import pandas as pd
-import io
-import json
+import numpy as np
+import math
 import time
-from datetime import datetime
+import zlib
 from pathlib import Path
-from components.transcript_generator import TranscriptGenerator
+from types import MappingProxyType
+from components.cache import form_data_key
+from components.prompts import PROMPT_TEMPLATE
 
 # Import custom components
+# Provider SDKs, pandas and python-docx are imported where they are used to keep cold start fast
 try:
-    from components.ai_providers import AIProviderManager
     from components.utils import (
         calculate_word_count, 
+        calculate_section_breakdown,
+        count_words,
         validate_api_key, 
         export_to_docx,
         export_to_txt,
+        search_transcript_lines,
         process_uploaded_file
     )
 except ImportError:
@@ -38,6 +42,24 @@ if 'generated_transcript' not in st.session_state:
     st.session_state.generated_transcript = ""
 if 'api_config' not in st.session_state:
     st.session_state.api_config = {}
+if 'batch_variants' not in st.session_state:
+    st.session_state.batch_variants = []
+
+# Transcripts at least this large are kept zlib-compressed in session state
+TRANSCRIPT_COMPRESS_MIN_BYTES = 4096
+
+def set_transcript(transcript):
+    """Store the generated transcript in session state, compressing large ones"""
+    data = transcript.encode('utf-8')
+    if len(data) >= TRANSCRIPT_COMPRESS_MIN_BYTES:
+        st.session_state.generated_transcript = zlib.compress(data)
+    else:
+        st.session_state.generated_transcript = transcript
+
+def get_transcript():
+    """Return the generated transcript, decompressing it if it was stored compressed"""
+    stored = st.session_state.generated_transcript
+    return zlib.decompress(stored).decode('utf-8') if isinstance(stored, bytes) else stored
 
 # AI Provider configurations
 AI_PROVIDERS = {
@@ -46,40 +68,72 @@ AI_PROVIDERS = {
         'models': ['gpt-4-turbo', 'gpt-4', 'gpt-3.5-turbo'],
         'languages': ['English', 'Hindi', 'Hinglish', 'French', 'Spanish', 'Mandarin', 'Arabic'],
         'usps': ['Best overall performance', 'Superior English & Hinglish', 'Realistic character development'],
-        'cost_per_1k': '$0.03-0.06'
+        'cost_per_1k': '$0.03-0.06',
+        'supports_batch': True  # Batch API: 50% cheaper, results within 24h
     },
     'anthropic': {
         'name': 'Anthropic Claude',
         'models': ['claude-3-opus-20240229', 'claude-3-sonnet-20240229', 'claude-3-haiku-20240307'],
         'languages': ['English', 'French', 'Spanish', 'Portuguese'],
         'usps': ['Best at following complex prompts', 'Superior consistency', 'Excellent character traits'],
-        'cost_per_1k': '$0.015-0.075'
+        'cost_per_1k': '$0.015-0.075',
+        'supports_batch': True  # Batch API: 50% cheaper, results within 24h
     },
     'google': {
         'name': 'Google AI (Gemini)',
         'models': ['gemini-pro', 'gemini-pro-vision'],
         'languages': ['English', 'Hindi', 'Hinglish', 'French', 'Spanish', 'Mandarin', 'Arabic', 'Portuguese'],
         'usps': ['Best for Hindi & Indian languages', 'Strong cultural context', 'Excellent regional dialects'],
-        'cost_per_1k': '$0.0005-0.002'
+        'cost_per_1k': '$0.0005-0.002',
+        'supports_batch': False
     },
     'cohere': {
         'name': 'Cohere',
         'models': ['command', 'command-light'],
         'languages': ['English', 'French', 'Spanish'],
         'usps': ['Best conversation coherence', 'Excellent for business scenarios', 'Strong logical flow'],
-        'cost_per_1k': '$0.015-0.025'
+        'cost_per_1k': '$0.015-0.025',
+        'supports_batch': False
     },
     'mistral': {
         'name': 'Mistral AI',
         'models': ['mistral-large-latest', 'mistral-medium-latest', 'mistral-small-latest'],
         'languages': ['English', 'French', 'Spanish', 'Portuguese'],
         'usps': ['Best for French language', 'Superior European cultural nuances', 'French-speaking regions'],
-        'cost_per_1k': '$0.0002-0.006'
+        'cost_per_1k': '$0.0002-0.006',
+        'supports_batch': False
     }
 }
 
+# Normalize provider metadata once at module load: immutable model options, set lookups for languages
+for provider in AI_PROVIDERS.values():
+    provider['models'] = tuple(provider['models'])
+    provider['languages_set'] = frozenset(provider['languages'])
+
+# Provider × language support matrix, built once at module load
+ALL_LANGUAGES = sorted(frozenset().union(*(provider['languages_set'] for provider in AI_PROVIDERS.values())))
+LANGUAGE_SUPPORT = np.array(
+    [[lang in provider['languages_set'] for lang in ALL_LANGUAGES] for provider in AI_PROVIDERS.values()],
+    dtype=np.uint8
+)
+
+# Static widget options derived from AI_PROVIDERS
+PROVIDER_KEYS = tuple(AI_PROVIDERS.keys())
+PROVIDER_NAMES = {key: provider['name'] for key, provider in AI_PROVIDERS.items()}
+PROVIDER_INDEX = {key: index for index, key in enumerate(PROVIDER_KEYS)}
+
+# API documentation links
+DOCS_LINKS = MappingProxyType({
+    'openai': 'https://platform.openai.com/docs',
+    'anthropic': 'https://docs.anthropic.com',
+    'google': 'https://ai.google.dev/docs',
+    'cohere': 'https://docs.cohere.com',
+    'mistral': 'https://docs.mistral.ai'
+})
+
+@st.cache_data(show_spinner=False)
 def get_recommended_provider(selected_languages):
-    """Get recommended AI provider based on selected languages"""
+    """Get recommended AI provider based on selected languages (pass a tuple)"""
     if 'Hindi' in selected_languages or 'Hinglish' in selected_languages:
         return 'google'
     elif len(selected_languages) == 1 and 'French' in selected_languages:
@@ -95,7 +149,8 @@ def render_api_configuration():
     
     # Get form data from session state
     selected_languages = st.session_state.get('languages', ['English'])
-    recommended_provider = get_recommended_provider(selected_languages)
+    selected_set = frozenset(selected_languages)
+    recommended_provider = get_recommended_provider(tuple(selected_languages))
     
     # Show recommendation
     st.info(f"💡 **Recommended for your languages ({', '.join(selected_languages)}):** {AI_PROVIDERS[recommended_provider]['name']}")
@@ -109,9 +164,9 @@ def render_api_configuration():
         # Create provider cards
         selected_provider = st.radio(
             "Choose your AI provider:",
-            options=list(AI_PROVIDERS.keys()),
-            format_func=lambda x: AI_PROVIDERS[x]['name'],
-            index=list(AI_PROVIDERS.keys()).index(recommended_provider),
+            options=PROVIDER_KEYS,
+            format_func=PROVIDER_NAMES.get,
+            index=PROVIDER_INDEX[recommended_provider],
             key="selected_provider"
         )
         
@@ -120,12 +175,7 @@ def render_api_configuration():
         
         # Language support
         st.markdown("**Language Support:**")
-        lang_status = []
-        for lang in provider_info['languages']:
-            if lang in selected_languages:
-                lang_status.append(f"✅ {lang}")
-            else:
-                lang_status.append(f"⚫ {lang}")
+        lang_status = [f"{'✅' if lang in selected_set else '⚫'} {lang}" for lang in provider_info['languages']]
         st.write(" | ".join(lang_status))
         
         # USPs
@@ -137,17 +187,17 @@ def render_api_configuration():
     
     with col2:
         st.markdown("#### Provider Comparison")
-        comparison_data = []
-        for key, provider in AI_PROVIDERS.items():
-            lang_support = len([l for l in provider['languages'] if l in selected_languages])
-            comparison_data.append({
-                'Provider': provider['name'],
-                'Languages': f"{lang_support}/{len(selected_languages)}",
-                'Cost': provider['cost_per_1k']
-            })
         
-        df = pd.DataFrame(comparison_data)
-        st.dataframe(df, use_container_width=True)
+        # Supported-language counts for every provider in a single matrix-vector product
+        selected_mask = np.array([lang in selected_set for lang in ALL_LANGUAGES], dtype=np.uint8)
+        supported_counts = LANGUAGE_SUPPORT @ selected_mask
+        
+        # Static markdown table: lighter to render than the interactive dataframe widget
+        rows = [
+            f"| {provider['name']} | {count}/{len(selected_languages)} | {provider['cost_per_1k']} |"
+            for provider, count in zip(AI_PROVIDERS.values(), supported_counts)
+        ]
+        st.markdown("| Provider | Languages | Cost |\n|---|---|---|\n" + "\n".join(rows))
     
     # Model selection
     if selected_provider:
@@ -158,6 +208,22 @@ def render_api_configuration():
             key="selected_model"
         )
         
+        # Batch mode for queued prompt variants: generated concurrently, or through the provider's
+        # batch API when opted in and the queue is large enough to be worth the wait
+        batch_mode = st.checkbox(
+            "Batch mode (generate variants together)",
+            key="batch_mode",
+            help="Queue prompt variants and generate them all concurrently"
+        )
+        batch_api = False
+        if provider_info['supports_batch']:
+            batch_api = st.checkbox(
+                "Use batch API for large batches (50% cheaper, ≤24h)",
+                key="batch_api",
+                disabled=not batch_mode,
+                help="Submit large batches through the provider's batch API; smaller batches are generated concurrently"
+            ) and batch_mode
+        
         # API Key input
         st.markdown("#### API Key")
         api_key = st.text_input(
@@ -175,22 +241,15 @@ def render_api_configuration():
                 st.session_state.api_config = {
                     'provider': selected_provider,
                     'model': selected_model,
-                    'api_key': api_key
+                    'api_key': api_key,
+                    'batch_mode': batch_mode,
+                    'batch_api': batch_api
                 }
             else:
                 st.error("❌ Invalid API key format")
                 st.session_state.api_config = {}
         
-        # API documentation links
-        docs_links = {
-            'openai': 'https://platform.openai.com/docs',
-            'anthropic': 'https://docs.anthropic.com',
-            'google': 'https://ai.google.dev/docs',
-            'cohere': 'https://docs.cohere.com',
-            'mistral': 'https://docs.mistral.ai'
-        }
-        
-        st.markdown(f"📚 [Get API Key & Documentation]({docs_links.get(selected_provider, '#')})")
+        st.markdown(f"📚 [Get API Key & Documentation]({DOCS_LINKS.get(selected_provider, '#')})")
 
 def render_form():
     """Render the main input form"""
@@ -252,6 +311,9 @@ def render_form():
         type=['pdf', 'docx', 'doc', 'txt'],
         help="Upload additional context about your study objectives"
     )
+    study_document = process_uploaded_file(uploaded_file)
+    if study_document:
+        st.caption(f"📄 Extracted ~{count_words(study_document):,} words from {uploaded_file.name}")
     
     # Duration and Location
     col1, col2 = st.columns(2)
@@ -286,8 +348,8 @@ def render_form():
         default=['English']
     )
     
-    # Store form data in session state
-    st.session_state.form_data = {
+    # Store form data in session state, keeping the same object across reruns while nothing changed
+    new_form_data = {
         'num_participants': num_participants,
         'male_count': male_count,
         'female_count': female_count,
@@ -300,9 +362,11 @@ def render_form():
         'location': location,
         'discussion_type': discussion_type.lower(),
         'languages': selected_languages,
-        'uploaded_file': uploaded_file
+        'study_document': study_document
     }
-    st.session_state.languages = selected_languages  # For API provider recommendation
+    if st.session_state.get('form_data') != new_form_data:
+        st.session_state.form_data = new_form_data
+        st.session_state.languages = selected_languages  # For API provider recommendation
     
     # Generate button
     st.markdown("---")
@@ -322,6 +386,36 @@ def render_form():
             st.session_state.step = 'prompt'
             st.rerun()
 
+# Characters of an uploaded study document included in the prompt
+STUDY_DOCUMENT_MAX_CHARS = 6000
+
+@st.cache_data(show_spinner=False)
+def build_prompt(form_data_items):
+    """Build the research prompt from form data items (cached across reruns)"""
+    form_data = dict(form_data_items)
+    estimated_words = calculate_word_count(form_data['duration'])
+    
+    study_document_section = ""
+    if form_data.get('study_document'):
+        excerpt = form_data['study_document'][:STUDY_DOCUMENT_MAX_CHARS]
+        study_document_section = f"STUDY DOCUMENT (excerpt):\n{excerpt}\n\n"
+    
+    opening_words, warmup_words, core_words, closing_words = (
+        words for _, words, _ in calculate_section_breakdown(estimated_words)
+    )
+    
+    return PROMPT_TEMPLATE.format_map({
+        **form_data,
+        'estimated_words': estimated_words,
+        'opening_words': opening_words,
+        'warmup_words': warmup_words,
+        'core_words': core_words,
+        'closing_words': closing_words,
+        'languages_str': ', '.join(form_data['languages']),
+        'languages_slash': '/'.join(form_data['languages']),
+        'study_document_section': study_document_section
+    })
+
 def render_prompt_page():
     """Render the prompt review and edit page"""
     st.title("📝 Review & Edit Generated Prompt")
@@ -330,78 +424,7 @@ def render_prompt_page():
     # Generate prompt if not already generated
     if not st.session_state.generated_prompt:
         with st.spinner("🔍 Researching topic and generating prompt..."):
-            # Simulate prompt generation
-            form_data = st.session_state.form_data
-            estimated_words = calculate_word_count(form_data['duration'])
-            
-            prompt = f"""FOCUS GROUP DISCUSSION GENERATOR PROMPT
-
-STUDY CONFIGURATION:
-- Participants: {form_data['num_participants']} total ({form_data['male_count']}M, {form_data['female_count']}F, {form_data['non_binary_count']}NB)
-- Age Range: {form_data['age_range']}
-- Demographics: {form_data['demographics']}
-- Topic: {form_data['topic']}
-- Objective: {form_data['objective']}
-- Duration: {form_data['duration']} minutes (Target: ~{estimated_words:,} words)
-- Location: {form_data['location']}
-- Type: {form_data['discussion_type']}
-- Languages: {', '.join(form_data['languages'])}
-
-RESEARCH REQUIREMENTS:
-1. Research the topic "{form_data['topic']}" thoroughly for {form_data['location']}
-2. Understand local market conditions, cultural nuances, and recent developments
-3. Generate realistic participant personas based on demographics and location
-4. Create natural conversation flow with local dialects and speech patterns
-
-TRANSCRIPT STRUCTURE:
-1. Opening (15% - {int(estimated_words * 0.15):,} words):
-   - Welcome and introductions
-   - Ground rules and recording consent
-   - Overview of discussion
-
-2. Warm-up (10% - {int(estimated_words * 0.10):,} words):
-   - Icebreaker questions
-   - General topic introduction
-
-3. Core Discussion (65% - {int(estimated_words * 0.65):,} words):
-   - Main research questions
-   - Deep probing and follow-ups
-   - Natural participant interactions
-
-4. Closing (10% - {int(estimated_words * 0.10):,} words):
-   - Summary of key points
-   - Final thoughts
-   - Thank you and wrap-up
-
-NATURAL SPEECH REQUIREMENTS:
-- Include natural speech patterns: "umm", "you know", "like"
-- Add grammatical imperfections and hesitations
-- Use local references and cultural context from {form_data['location']}
-- Include appropriate dialect/accent markers for {'/'.join(form_data['languages'])}
-- Show realistic group dynamics (interruptions, agreements, disagreements)
-
-MODERATOR BEHAVIOR:
-- Maintain neutrality throughout
-- Use probing questions: "Can you tell me more about that?", "What do others think?"
-- Manage participation: encourage quiet members, tactfully redirect dominant ones
-- Bridge between topics smoothly
-- Summarize and reflect back key points
-
-PARTICIPANT PERSONAS:
-Generate {form_data['num_participants']} distinct personalities with:
-- Realistic names appropriate for {form_data['location']}
-- Varied speaking styles and opinions
-- Different levels of engagement
-- Authentic demographic representation
-
-OUTPUT FORMAT:
-Generate a realistic focus group transcript with:
-- Timestamp markers every 5-10 minutes
-- Speaker identification (Moderator, Participant names)
-- Natural conversation flow
-- Realistic pace and word count distribution
-- Cultural authenticity and local relevance
-"""
+            prompt = build_prompt(form_data_key(st.session_state.form_data))
             
             st.session_state.generated_prompt = prompt
     
@@ -416,6 +439,10 @@ Generate a realistic focus group transcript with:
     # Update session state with edited prompt
     st.session_state.generated_prompt = edited_prompt
     
+    if st.session_state.api_config.get('batch_mode'):
+        render_batch_actions(edited_prompt)
+        return
+    
     # Action buttons
     col1, col2 = st.columns(2)
     
@@ -429,64 +456,232 @@ Generate a realistic focus group transcript with:
             st.session_state.step = 'generating'
             st.rerun()
 
+def render_batch_actions(edited_prompt):
+    """Render the prompt page actions for batch mode: queue variants or submit the batch"""
+    from components.ai_providers import BATCH_API_MIN_PROMPTS, BATCH_API_PROVIDERS, get_provider_manager
+    
+    api_config = st.session_state.api_config
+    queued = st.session_state.batch_variants
+    # Only opted-in batches large enough to be worth the wait go through the provider's batch API
+    use_batch_api = (
+        api_config.get('batch_api', False)
+        and api_config['provider'] in BATCH_API_PROVIDERS
+        and len(queued) + 1 >= BATCH_API_MIN_PROMPTS
+    )
+    st.info(f"📦 Batch mode: {len(queued)} variant(s) queued. The current prompt is added when you submit.")
+    if api_config.get('batch_api') and not use_batch_api:
+        st.caption(f"Batches under {BATCH_API_MIN_PROMPTS} variants are generated concurrently instead of through the batch API.")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if st.button("← Back to Form", use_container_width=True):
+            st.session_state.step = 'form'
+            st.rerun()
+    
+    with col2:
+        if st.button("➕ Queue & Create Variant", use_container_width=True):
+            # Keep this prompt and return to the form to adjust inputs for the next variant
+            queued.append((edited_prompt, dict(form_data_key(st.session_state.form_data))))
+            st.session_state.generated_prompt = ""
+            st.session_state.step = 'form'
+            st.rerun()
+    
+    with col3:
+        if st.button(f"📦 Submit Batch ({len(queued) + 1})", type="primary", use_container_width=True):
+            from components.transcript_generator import TranscriptGenerator
+            
+            variants = queued + [(edited_prompt, dict(form_data_key(st.session_state.form_data)))]
+            manager = get_provider_manager()
+            # Each variant gets the same research enhancement and post-processing as a single transcript
+            generator = TranscriptGenerator(manager)
+            batch_job = {
+                'provider': api_config['provider'],
+                'batch_id': None,
+                'topics': [form_data['topic'] for _, form_data in variants],
+                'form_data': [form_data for _, form_data in variants]
+            }
+            try:
+                manager.initialize_provider(api_config['provider'], api_config['api_key'], api_config['model'])
+                if use_batch_api:
+                    batch_job['batch_id'] = generator.submit_batch(variants, api_config)
+                else:
+                    with st.spinner(f"Generating {len(variants)} variants concurrently..."):
+                        outcomes = manager.submit(generator.batch_generate(variants, api_config)).result()
+                    batch_job['results'] = {index: outcome for index, outcome in enumerate(outcomes) if isinstance(outcome, str)}
+                    batch_job['errors'] = {index: outcome.message for index, outcome in enumerate(outcomes) if isinstance(outcome, Exception)}
+            except Exception as e:
+                st.error(f"Error submitting batch: {str(e)}")
+                return
+            
+            st.session_state.batch_job = batch_job
+            st.session_state.batch_variants = []
+            st.session_state.step = 'batch'
+            st.rerun()
+
+# Seconds between checks on the background generation job while it streams
+GENERATION_POLL_SECONDS = 0.1
+
+# Streamed chunks received between refreshes of the transcript preview and progress bar
+PREVIEW_REFRESH_CHUNKS = 20
+
+async def collect_transcript_stream(generator, form_data, api_config, generated_prompt, chunks):
+    """Append streamed (section index, chunk) pairs to a shared list as they arrive"""
+    async for item in generator.astream_transcript(form_data, api_config, generated_prompt):
+        chunks.append(item)
+
+def start_generation_job(form_data, api_config, generated_prompt):
+    """Run transcript generation on the provider manager's event loop so the script stays responsive"""
+    from components.ai_providers import get_provider_manager
+    from components.transcript_generator import TranscriptGenerator
+    
+    generator = TranscriptGenerator(get_provider_manager())
+    chunks = []
+    future = generator.ai_manager.submit(
+        collect_transcript_stream(generator, form_data, api_config, generated_prompt, chunks)
+    )
+    return {'generator': generator, 'future': future, 'chunks': chunks, 'started': time.monotonic()}
+
+def cancel_generation():
+    """Stop the running generation job and return to the prompt page"""
+    job = st.session_state.pop('generation_job', None)
+    if job is not None:
+        job['future'].cancel()  # Cancels the task, and with it the outstanding section requests
+    st.session_state.step = 'prompt'
+
+def poll_generation_job(job, form_data, progress_bar, preview, status_text):
+    """Render the transcript as the worker streams it, driving the progress bar off received tokens"""
+    # Streamed chunks are roughly one token each; ~1.3 tokens per word
+    estimated_tokens = calculate_word_count(form_data['duration']) * 1.3
+    sections = {}
+    received = 0
+    rendered = 0
+    shown_seconds = None
+    
+    def assemble():
+        # Sections stream concurrently; always show them in transcript order
+        return "\n\n".join("".join(sections[index]) for index in sorted(sections))
+    
+    while True:
+        # Check for completion before reading so the final chunks are never missed
+        done = job['future'].done()
+        new_chunks = job['chunks'][received:]
+        for index, chunk in new_chunks:
+            sections.setdefault(index, []).append(chunk)
+        received += len(new_chunks)
+        
+        if done:
+            return assemble()
+        
+        # Re-sending the whole preview is costly, so refresh it only every PREVIEW_REFRESH_CHUNKS chunks
+        if received - rendered >= PREVIEW_REFRESH_CHUNKS:
+            rendered = received
+            preview.markdown(assemble())
+            progress_bar.progress(min(99, int(received / estimated_tokens * 100)))
+        
+        # Streamlit only stops the script for a rerun (such as a Cancel click) when it next sends an element,
+        # so the elapsed time is refreshed every second even while persona generation runs and no chunks arrive
+        elapsed = int(time.monotonic() - job['started'])
+        if elapsed != shown_seconds:
+            shown_seconds = elapsed
+            status_text.text(f"💬 Generating natural conversation flow... ({elapsed}s)")
+        time.sleep(GENERATION_POLL_SECONDS)
+
 def render_generating_page():
-    """Render the transcript generation page with progress"""
+    """Render the transcript generation page, streaming the transcript as it is written"""
     st.title("🎬 Generating Your Focus Group Transcript")
     
     # Progress indicators
     progress_bar = st.progress(0)
     status_text = st.empty()
+    preview = st.empty()
     
-    # Simulate generation process
     if not st.session_state.generated_transcript:
-        generator = TranscriptGenerator()
         form_data = st.session_state.form_data
-        api_config = st.session_state.api_config
-        generated_prompt = st.session_state.generated_prompt
         
-        # Stage 1: Research
-        status_text.text("🔍 Researching topic and market conditions...")
-        progress_bar.progress(20)
-        time.sleep(2)
+        # The job outlives reruns, so a widget interaction resumes polling instead of restarting
+        if 'generation_job' not in st.session_state:
+            st.session_state.generation_job = start_generation_job(
+                form_data, st.session_state.api_config, st.session_state.generated_prompt
+            )
+        job = st.session_state.generation_job
         
-        # Stage 2: Persona Creation
-        status_text.text("👥 Creating participant personas...")
-        progress_bar.progress(40)
-        time.sleep(2)
+        st.button("⏹️ Cancel", on_click=cancel_generation)
+        transcript = poll_generation_job(job, form_data, progress_bar, preview, status_text)
+        del st.session_state.generation_job
         
-        # Stage 3: Cultural Context
-        status_text.text("🌍 Analyzing cultural context and local references...")
-        progress_bar.progress(60)
-        time.sleep(2)
+        try:
+            job['future'].result()
+            status_text.text("✨ Finalizing transcript and applying language patterns...")
+            set_transcript(job['generator'].finalize_transcript(transcript, form_data))
+            st.session_state.t_page = 0
+        except Exception as e:
+            # Shown on the results page: the rerun below would clear an error rendered here
+            st.session_state.generation_error = f"Error generating transcript: {str(e)}"
+            set_transcript("Failed to generate transcript due to an error.")
         
-        # Stage 4: Transcript Generation
-        status_text.text("💬 Generating natural conversation flow...")
-        progress_bar.progress(80)
-        with st.spinner("Generating transcript with AI..."):
-            try:
-                st.session_state.generated_transcript = generator.generate_full_transcript(form_data, api_config, generated_prompt)
-            except Exception as e:
-                st.error(f"Error generating transcript: {str(e)}")
-                st.session_state.generated_transcript = "Failed to generate transcript due to an error."
-        
-        # Stage 5: Final Processing
-        status_text.text("✨ Finalizing transcript and applying language patterns...")
         progress_bar.progress(100)
-        time.sleep(1)
-        
         status_text.text("✅ Transcript generation complete!")
     
     # Automatically move to results
-    time.sleep(1)
     st.session_state.step = 'result'
     st.rerun()
 
+# Transcript lines shown per page on the results page
+TRANSCRIPT_PAGE_LINES = 200
+
+def change_transcript_page(delta):
+    """Move the results-page transcript view by delta pages"""
+    st.session_state.t_page = st.session_state.get('t_page', 0) + delta
+
+def reset_transcript_page():
+    """Return the results-page transcript view to its first page, e.g. when the search term changes"""
+    st.session_state.t_page = 0
+
+def render_transcript_page(lines, highlighted=False):
+    """Render one page of transcript lines with previous/next controls
+    
+    Highlighted search matches are shown as markdown, the plain transcript in a read-only text area.
+    """
+    total_pages = max(1, math.ceil(len(lines) / TRANSCRIPT_PAGE_LINES))
+    page = min(max(st.session_state.get('t_page', 0), 0), total_pages - 1)
+    st.session_state.t_page = page
+    
+    start = page * TRANSCRIPT_PAGE_LINES
+    page_lines = lines[start:start + TRANSCRIPT_PAGE_LINES]
+    if highlighted:
+        st.markdown("\n\n".join(page_lines))
+    else:
+        st.text_area(
+            "Transcript Content",
+            value="\n".join(page_lines),
+            height=400,
+            disabled=True
+        )
+    
+    if total_pages > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            st.button("◀ Previous", on_click=change_transcript_page, args=(-1,), disabled=page == 0)
+        with col2:
+            st.caption(f"Page {page + 1} of {total_pages}")
+        with col3:
+            st.button("Next ▶", on_click=change_transcript_page, args=(1,), disabled=page == total_pages - 1)
+
 def render_result_page():
     """Render the final transcript results page"""
+    import pandas as pd
+    
     st.title("📄 Generated Focus Group Transcript")
     
+    # Report a failed generation once, on the first render after it
+    generation_error = st.session_state.pop('generation_error', None)
+    if generation_error:
+        st.error(generation_error)
+    
     form_data = st.session_state.form_data
     estimated_words = calculate_word_count(form_data['duration'])
+    transcript = get_transcript()
     
     # Action buttons at the top
     col1, col2, col3 = st.columns(3)
@@ -494,7 +689,7 @@ def render_result_page():
     with col1:
         if st.download_button(
             label="📥 Download TXT",
-            data=export_to_txt(st.session_state.generated_transcript, form_data),
+            data=export_to_txt(transcript, form_data),
             file_name=f"focus_group_{form_data['topic'].replace(' ', '_')}.txt",
             mime="text/plain",
             use_container_width=True
@@ -503,7 +698,7 @@ def render_result_page():
     
     with col2:
         # Convert to DOCX format
-        docx_data = export_to_docx(st.session_state.generated_transcript, form_data)
+        docx_data = export_to_docx(transcript, form_data)
         if st.download_button(
             label="📥 Download DOCX",
             data=docx_data,
@@ -538,16 +733,9 @@ def render_result_page():
     
     # Additional statistics
     with st.expander("📈 Detailed Statistics"):
-        word_breakdown = {
-            'Opening (15%)': int(estimated_words * 0.15),
-            'Warm-up (10%)': int(estimated_words * 0.10),
-            'Core Discussion (65%)': int(estimated_words * 0.65),
-            'Closing (10%)': int(estimated_words * 0.10)
-        }
-        
         stat_df = pd.DataFrame([
-            {"Section": k, "Words": v, "Percentage": k.split('(')[1].split(')')[0]} 
-            for k, v in word_breakdown.items()
+            {"Section": section, "Words": words, "Percentage": percentage}
+            for section, words, percentage in calculate_section_breakdown(estimated_words)
         ])
         
         st.dataframe(stat_df, use_container_width=True)
@@ -556,25 +744,19 @@ def render_result_page():
     st.markdown("### 📄 Generated Transcript")
     
     # Search functionality
-    search_term = st.text_input("🔍 Search in transcript:", placeholder="Enter keyword to search...")
+    search_term = st.text_input(
+        "🔍 Search in transcript:",
+        placeholder="Enter keyword to search...",
+        on_change=reset_transcript_page
+    )
     
     # Display transcript
-    transcript_display = st.session_state.generated_transcript
-    
     if search_term:
-        # Highlight search terms (simplified)
-        highlighted = transcript_display.replace(
-            search_term, 
-            f"**{search_term}**"
-        )
-        st.markdown(highlighted)
+        matches = search_transcript_lines(transcript, search_term)
+        st.caption(f"{len(matches)} matching line(s)")
+        render_transcript_page(matches, highlighted=True)
     else:
-        st.text_area(
-            "Transcript Content",
-            value=transcript_display,
-            height=400,
-            disabled=True
-        )
+        render_transcript_page(transcript.splitlines())
     
     # Feedback section
     st.markdown("---")
@@ -592,17 +774,88 @@ def render_result_page():
     if st.button("Submit Feedback"):
         st.success("Thank you for your feedback!")
 
+def render_batch_page():
+    """Render the status and results of a submitted batch"""
+    st.title("📦 Batch Transcript Generation")
+    
+    batch_job = st.session_state.batch_job
+    api_config = st.session_state.api_config
+    provider_name = batch_job['provider']
+    
+    if batch_job['batch_id'] is None:
+        st.info(f"{len(batch_job['topics'])} variant(s) were generated concurrently with {AI_PROVIDERS[provider_name]['name']}.")
+    else:
+        st.info(
+            f"Batch `{batch_job['batch_id']}` with {len(batch_job['topics'])} variant(s) was submitted to "
+            f"{AI_PROVIDERS[provider_name]['name']}. Batches cost 50% less and complete within 24 hours."
+        )
+    
+    # Failed variants are reported together rather than one alert per failure
+    errors = batch_job.get('errors')
+    if errors:
+        st.error(
+            f"{len(errors)} variant(s) failed:\n"
+            + "\n".join(f"- Variant {index + 1}: {message}" for index, message in errors.items())
+        )
+    
+    if 'results' not in batch_job:
+        from components.ai_providers import get_provider_manager
+        from components.transcript_generator import TranscriptGenerator
+        
+        generator = TranscriptGenerator(get_provider_manager())
+        try:
+            status, results = generator.poll_batch(batch_job['batch_id'], batch_job['form_data'], api_config)
+            st.markdown(f"**Status:** {status}")
+            if results is not None:
+                batch_job['results'] = results
+        except Exception as e:
+            st.error(f"Error checking batch status: {str(e)}")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        if 'results' not in batch_job and st.button("🔄 Refresh Status", use_container_width=True):
+            st.rerun()
+    
+    with col2:
+        if st.button("🔄 Start Over", use_container_width=True):
+            del st.session_state['batch_job']
+            st.session_state.generated_prompt = ""
+            st.session_state.step = 'form'
+            st.rerun()
+    
+    # Completed variants
+    for index, topic in enumerate(batch_job['topics']):
+        transcript = batch_job.get('results', {}).get(index)
+        if transcript is None:
+            continue
+        with st.expander(f"Variant {index + 1}: {topic}"):
+            st.text_area("Transcript Content", value=transcript, height=300, disabled=True, key=f"batch_transcript_{index}")
+            st.download_button(
+                label="📥 Download TXT",
+                data=transcript,
+                file_name=f"focus_group_{topic.replace(' ', '_')}_variant_{index + 1}.txt",
+                mime="text/plain",
+                key=f"batch_download_{index}"
+            )
+
+# Bundled sidebar logo, read from disk instead of fetched from a placeholder service
+LOGO_PATH = Path(__file__).parent / "static" / "logo.png"
+
 # Main application logic
 def main():
     """Main application entry point"""
     
     # Sidebar with navigation
     with st.sidebar:
-        st.image("https://via.placeholder.com/150x50/3b82f6/white?text=FGG", width=150)
+        st.image(str(LOGO_PATH), width=150)
         st.markdown("### Navigation")
         
         # Progress indicator
-        steps = ['Form', 'Prompt', 'Generating', 'Result']  # Fixed 'Generate' to 'Generating'
+        if st.session_state.step == 'batch':
+            steps = ['Form', 'Prompt', 'Batch']
+        else:
+            steps = ['Form', 'Prompt', 'Generating', 'Result']  # Fixed 'Generate' to 'Generating'
         
         current_step_index = steps.index(st.session_state.step.title())
         
@@ -644,6 +897,8 @@ def main():
         render_generating_page()
     elif st.session_state.step == 'result':
         render_result_page()
+    elif st.session_state.step == 'batch':
+        render_batch_page()
 
 if __name__ == "__main__":
     main()
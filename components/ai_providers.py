@@ -3,20 +3,487 @@ AI Provider integrations for the Focus Group Generator
 """
 
 import streamlit as st
-import openai
-import anthropic
-import google.generativeai as genai
-import cohere
-from mistralai.client import MistralClient
+import httpx
+import asyncio
+import hashlib
+import importlib
+import logging
+import queue
+import random
+import threading
 import time
-import json
+import orjson
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
 from components.utils import calculate_word_count  # Explicit import to ensure availability
+from components.cache import get_response_cache
+
+# Sampling temperature used for every provider (also part of the response cache key)
+TEMPERATURE = 0.7
+
+# Context window of each model, shared by the prompt and the completion
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4-turbo': 128000,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 16385,
+    'claude-3-opus-20240229': 200000,
+    'claude-3-sonnet-20240229': 200000,
+    'claude-3-haiku-20240307': 200000,
+    'gemini-pro': 32768,
+    'gemini-pro-vision': 16384,
+    'command': 4096,
+    'command-light': 4096
+}
+
+# Maximum completion tokens each model accepts; requested budgets are capped to these
+MODEL_OUTPUT_LIMITS = {
+    'gpt-4-turbo': 4096,
+    'gpt-4': 8192,
+    'gpt-3.5-turbo': 4096,
+    'claude-3-opus-20240229': 4096,
+    'claude-3-sonnet-20240229': 4096,
+    'claude-3-haiku-20240307': 4096,
+    'gemini-pro': 2048,
+    'gemini-pro-vision': 2048,
+    'command': 4000,
+    'command-light': 4000
+}
+
+# Context tokens left free to absorb error in the ~4 characters per token prompt estimate
+CONTEXT_MARGIN_TOKENS = 256
+
+def estimate_tokens(*texts):
+    """Rough token count of prompt texts, at ~4 characters per token"""
+    return sum(len(text) for text in texts if text) // 4
+
+def output_budget(model, form_data, input_tokens, max_tokens=None):
+    """Integer completion budget for a request, defaulting to the study length
+    
+    The budget is capped at the model's output limit and at the room its context window leaves after the prompt.
+    """
+    if max_tokens is None:
+        max_tokens = calculate_word_count(form_data['duration']) * 1.5  # Approx tokens
+    budget = min(int(max_tokens), MODEL_OUTPUT_LIMITS.get(model, int(max_tokens)))
+    
+    context_window = MODEL_CONTEXT_WINDOWS.get(model)
+    if context_window is not None:
+        budget = min(budget, context_window - input_tokens - CONTEXT_MARGIN_TOKENS)
+        if budget <= 0:
+            raise ValueError(
+                f"A prompt of ~{input_tokens:,} tokens leaves no room for a completion in the "
+                f"{context_window:,}-token context window of {model}"
+            )
+    return budget
+
+# Providers with an asynchronous batch API, and the smallest queue worth sending through it instead of generating concurrently
+BATCH_API_PROVIDERS = frozenset({'openai', 'anthropic'})
+BATCH_API_MIN_PROMPTS = 10
+
+# Connection pool shared by every SDK client of the manager
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=100)
+HTTP_TIMEOUT = 60.0
+
+# Chat models kept per (provider, API key, model); the least recently used are dropped beyond this
+PROVIDER_CLIENTS_MAX = 32
+
+# Line templates for the simulated fallback transcript, joined once instead of concatenated
+SIMULATED_TRANSCRIPT_LINES = (
+    "[00:00] MODERATOR: Welcome to the focus group on {topic}. This is a simulated transcript due to API failure.",
+    "[00:05] PARTICIPANT 1: This is a placeholder response with about {turn_words} words.",
+    "[00:10] PARTICIPANT 2: Another response here, adding more context.",
+    "... (Transcript continues for {duration} minutes with ~{estimated_words} words total)"
+)
+
+# Transient provider errors are retried with full-jitter exponential backoff
+RETRY_ATTEMPTS = 5
+RETRY_MIN_SECONDS = 1
+RETRY_MAX_SECONDS = 30
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+logger = logging.getLogger(__name__)
+
+def _combine_prompt(system, prompt):
+    """Single-string form of a (system prefix, prompt) pair for providers without a separate system field"""
+    return f"{system}\n\n{prompt}" if system else prompt
+
+def is_retryable(error):
+    """True for rate limits, server errors, timeouts and dropped connections from any provider SDK"""
+    if isinstance(error, (httpx.TransportError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    # SDK connection/timeout errors, matched by name so checking them never imports an SDK
+    if any(cls.__name__ == 'APIConnectionError' for cls in type(error).__mro__):
+        return True
+    # OpenAI, Anthropic and Cohere errors carry status_code; google.genai errors carry an HTTP code
+    status = getattr(error, 'status_code', None) or getattr(error, 'code', None)
+    return status in RETRYABLE_STATUS_CODES
+
+@dataclass
+class GenerationError(Exception):
+    """Structured provider failure, returned or raised to the UI instead of being rendered where it happens"""
+    provider: str
+    message: str
+    retryable: bool = False
+    
+    def __post_init__(self):
+        # The dataclass __init__ skips Exception.__init__, which would leave args empty
+        super().__init__(str(self))
+    
+    def __str__(self):
+        return f"{self.provider}: {self.message}"
+    
+    def __reduce__(self):
+        return type(self), (self.provider, self.message, self.retryable)
+    
+    @classmethod
+    def from_exception(cls, provider, error):
+        if isinstance(error, cls):
+            return error
+        return cls(provider, str(error) or type(error).__name__, is_retryable(error))
+
+def retry_delay(attempt):
+    """Full-jitter exponential backoff for the given zero-based retry attempt"""
+    return random.uniform(RETRY_MIN_SECONDS, min(RETRY_MAX_SECONDS, RETRY_MIN_SECONDS * 2 ** attempt))
+
+def _log_openai_cache_usage(usage):
+    details = getattr(usage, 'prompt_tokens_details', None)
+    logger.info("OpenAI prompt tokens: %s (%s cached)", usage.prompt_tokens, getattr(details, 'cached_tokens', 0))
+
+def _log_anthropic_cache_usage(usage):
+    logger.info(
+        "Anthropic input tokens: %s (cache read %s, cache write %s)",
+        usage.input_tokens,
+        getattr(usage, 'cache_read_input_tokens', 0),
+        getattr(usage, 'cache_creation_input_tokens', 0)
+    )
+
+class ChatModelBase(ABC):
+    """A provider's chat model: formats a prompt into the provider-native request once, then completes or streams it
+    
+    Subclasses set type and sdk_module and implement from_sdk, _formatter, acall and astream.
+    """
+    type = None
+    sdk_module = None
+    supports_n = False  # Whether acall_n returns all n completions from a single request
+    simulate_on_exhaustion = False  # Whether exhausted retries fall back to a simulated transcript
+    request_bucket = None  # Per-minute rate limiters for this API key and model, attached by the manager
+    token_bucket = None
+    
+    def __init__(self, client, aclient, model):
+        self.client = client
+        self.aclient = aclient
+        self.model = model
+    
+    @classmethod
+    @abstractmethod
+    def from_sdk(cls, sdk, api_key, model, http, ahttp):
+        """Build the model's clients from its SDK module on the manager's pooled HTTP clients"""
+    
+    def format(self, prompt, max_tokens, system=None):
+        """Request payload for one completion, built once and shared by every attempt"""
+        return {
+            'max_tokens': max_tokens,
+            'input_tokens': estimate_tokens(prompt, system),
+            'request': self._formatter(prompt, max_tokens, system)
+        }
+    
+    @abstractmethod
+    def _formatter(self, prompt, max_tokens, system):
+        """Provider-native request arguments for a (system prefix, prompt) pair"""
+    
+    @abstractmethod
+    async def acall(self, payload):
+        """Complete a formatted request and return the transcript text"""
+    
+    async def acall_n(self, payload, n):
+        """Return n completions of a formatted request, issued as concurrent single requests by default"""
+        return list(await asyncio.gather(*(self.acall(payload) for _ in range(n))))
+    
+    @abstractmethod
+    def astream(self, payload):
+        """Async iterator over transcript text chunks for a formatted request"""
+    
+    def submit_batch(self, batch_requests):
+        """Submit (custom_id, prompt, max_tokens) requests to the provider's batch API and return the batch id"""
+        raise ValueError(f"{self.type} does not support batch generation")
+    
+    def retrieve_batch(self, batch_id):
+        """Check a submitted batch; returns (status, {variant index: transcript}) with results once complete"""
+        raise ValueError(f"{self.type} does not support batch generation")
+
+class OpenAIChatModel(ChatModelBase):
+    """OpenAI chat completions"""
+    type = 'openai'
+    sdk_module = 'openai'
+    supports_n = True
+    
+    @classmethod
+    def from_sdk(cls, sdk, api_key, model, http, ahttp):
+        return cls(
+            sdk.OpenAI(api_key=api_key, http_client=http),
+            sdk.AsyncOpenAI(api_key=api_key, http_client=ahttp, max_retries=0),
+            model
+        )
+    
+    def _formatter(self, prompt, max_tokens, system):
+        messages = [{"role": "user", "content": prompt}]
+        if system:
+            # OpenAI caches repeated prompt prefixes automatically; the shared system message keeps the prefix stable
+            messages.insert(0, {"role": "system", "content": system})
+        return {'model': self.model, 'messages': messages, 'max_tokens': max_tokens, 'temperature': TEMPERATURE}
+    
+    async def acall(self, payload):
+        response = await self.aclient.chat.completions.create(**payload['request'])
+        _log_openai_cache_usage(response.usage)
+        return response.choices[0].message.content
+    
+    async def acall_n(self, payload, n):
+        response = await self.aclient.chat.completions.create(**payload['request'], n=n)
+        return [choice.message.content for choice in response.choices]
+    
+    async def astream(self, payload):
+        stream = await self.aclient.chat.completions.create(
+            **payload['request'],
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            if chunk.usage:
+                _log_openai_cache_usage(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    
+    def submit_batch(self, batch_requests):
+        batch_lines = [
+            orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._formatter(prompt, max_tokens, None)
+            })
+            for custom_id, prompt, max_tokens in batch_requests
+        ]
+        batch_file = self.client.files.create(
+            file=("focus_group_batch.jsonl", b"\n".join(batch_lines)),
+            purpose="batch"
+        )
+        batch = self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        return batch.id
+    
+    def retrieve_batch(self, batch_id):
+        batch = self.client.batches.retrieve(batch_id)
+        if batch.status != 'completed':
+            return batch.status, None
+        
+        results = {}
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).content.splitlines():
+                if not line.strip():
+                    continue
+                record = orjson.loads(line)
+                response = record.get('response') or {}
+                if response.get('status_code') == 200:
+                    results[int(record['custom_id'])] = response['body']['choices'][0]['message']['content']
+        return 'completed', results
+
+class AnthropicChatModel(ChatModelBase):
+    """Anthropic messages"""
+    type = 'anthropic'
+    sdk_module = 'anthropic'
+    
+    @classmethod
+    def from_sdk(cls, sdk, api_key, model, http, ahttp):
+        return cls(
+            sdk.Anthropic(api_key=api_key, http_client=http),
+            sdk.AsyncAnthropic(api_key=api_key, http_client=ahttp, max_retries=0),
+            model
+        )
+    
+    def _formatter(self, prompt, max_tokens, system):
+        request = {
+            'model': self.model,
+            'max_tokens': max_tokens,
+            'temperature': TEMPERATURE,
+            'messages': [{"role": "user", "content": prompt}]
+        }
+        if system:
+            # Mark the shared prefix as cacheable so repeat requests reuse it server-side
+            request['system'] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        return request
+    
+    async def acall(self, payload):
+        response = await self.aclient.messages.create(**payload['request'])
+        _log_anthropic_cache_usage(response.usage)
+        return response.content[0].text
+    
+    async def astream(self, payload):
+        async with self.aclient.messages.stream(**payload['request']) as stream:
+            async for text in stream.text_stream:
+                yield text
+            _log_anthropic_cache_usage((await stream.get_final_message()).usage)
+    
+    def submit_batch(self, batch_requests):
+        batch = self.client.messages.batches.create(requests=[
+            {"custom_id": custom_id, "params": self._formatter(prompt, max_tokens, None)}
+            for custom_id, prompt, max_tokens in batch_requests
+        ])
+        return batch.id
+    
+    def retrieve_batch(self, batch_id):
+        batch = self.client.messages.batches.retrieve(batch_id)
+        if batch.processing_status != 'ended':
+            return batch.processing_status, None
+        
+        results = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            if entry.result.type == 'succeeded':
+                results[int(entry.custom_id)] = entry.result.message.content[0].text
+        return 'completed', results
+
+class GeminiChatModel(ChatModelBase):
+    """Google Gemini"""
+    type = 'google'
+    sdk_module = 'google.genai'
+    
+    def __init__(self, sdk, client, model):
+        super().__init__(client.models, client.aio.models, model)
+        self._sdk = sdk
+        self._generation_configs = {}  # max_tokens -> GenerateContentConfig, built once per budget
+    
+    @classmethod
+    def from_sdk(cls, sdk, api_key, model, http, ahttp):
+        # A Client carries its own key, unlike the process-wide genai.configure, so sessions never share credentials
+        return cls(sdk, sdk.Client(api_key=api_key), model)
+    
+    def _formatter(self, prompt, max_tokens, system):
+        if max_tokens not in self._generation_configs:
+            self._generation_configs[max_tokens] = self._sdk.types.GenerateContentConfig(
+                max_output_tokens=max_tokens,
+                temperature=TEMPERATURE
+            )
+        return {
+            'model': self.model,
+            'contents': _combine_prompt(system, prompt),
+            'config': self._generation_configs[max_tokens]
+        }
+    
+    async def acall(self, payload):
+        response = await self.aclient.generate_content(**payload['request'])
+        return response.text or ""
+    
+    async def astream(self, payload):
+        async for chunk in await self.aclient.generate_content_stream(**payload['request']):
+            if chunk.text:
+                yield chunk.text
+
+class CohereChatModel(ChatModelBase):
+    """Cohere chat"""
+    type = 'cohere'
+    sdk_module = 'cohere'
+    
+    @classmethod
+    def from_sdk(cls, sdk, api_key, model, http, ahttp):
+        return cls(
+            sdk.Client(api_key=api_key, httpx_client=http),
+            sdk.AsyncClient(api_key=api_key, httpx_client=ahttp),
+            model
+        )
+    
+    def _formatter(self, prompt, max_tokens, system):
+        request = {'model': self.model, 'message': prompt, 'max_tokens': max_tokens, 'temperature': TEMPERATURE}
+        if system:
+            request['preamble'] = system
+        return request
+    
+    async def acall(self, payload):
+        response = await self.aclient.chat(**payload['request'])
+        return response.text
+    
+    async def astream(self, payload):
+        async for event in self.aclient.chat_stream(**payload['request']):
+            if event.event_type == 'text-generation':
+                yield event.text
+
+class MistralChatModel(ChatModelBase):
+    """Mistral chat"""
+    type = 'mistral'
+    sdk_module = 'mistralai'
+    simulate_on_exhaustion = True
+    
+    @classmethod
+    def from_sdk(cls, sdk, api_key, model, http, ahttp):
+        # One Mistral client serves both sync and async calls on the pooled HTTP clients
+        client = sdk.Mistral(api_key=api_key, client=http, async_client=ahttp)
+        return cls(client, client, model)
+    
+    def _formatter(self, prompt, max_tokens, system):
+        return {
+            'model': self.model,
+            'messages': [{"role": "user", "content": _combine_prompt(system, prompt)}],
+            'max_tokens': max_tokens,
+            'temperature': TEMPERATURE
+        }
+    
+    async def acall(self, payload):
+        response = await self.aclient.chat.complete_async(**payload['request'])
+        if not response or not response.choices:
+            raise RuntimeError("Mistral returned an empty response")
+        return response.choices[0].message.content
+    
+    async def astream(self, payload):
+        stream = await self.aclient.chat.stream_async(**payload['request'])
+        received = False
+        async for event in stream:
+            if event.data.choices and event.data.choices[0].delta.content:
+                received = True
+                yield event.data.choices[0].delta.content
+        if not received:
+            raise RuntimeError("Mistral returned an empty response")
+
+# Provider name -> chat model class; the provider's methods are resolved once, when it is initialized
+CHAT_MODELS = {
+    model_class.type: model_class
+    for model_class in (OpenAIChatModel, AnthropicChatModel, GeminiChatModel, CohereChatModel, MistralChatModel)
+}
+
+class TokenBucket:
+    """Token-bucket rate limiter shared safely across threads and event loops"""
+    
+    def __init__(self, capacity, per_seconds=60):
+        self.capacity = capacity
+        self.refill_rate = capacity / per_seconds
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _reserve(self, n):
+        """Take n tokens, going into debt if needed, and return the seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.refill_rate)
+            self.last_refill = now
+            self.tokens -= min(n, self.capacity)
+            return max(0.0, -self.tokens / self.refill_rate)
+    
+    async def acquire(self, n=1):
+        """Wait until n tokens are available without blocking the event loop"""
+        wait = self._reserve(n)
+        if wait:
+            await asyncio.sleep(wait)
 
 class AIProviderManager:
     """Manages all AI provider integrations and handles transcript generation"""
     
     def __init__(self):
-        self.providers = {}
+        # (provider name, API key digest, model) -> ChatModelBase, least recently used first
+        self.providers = OrderedDict()
+        self._providers_lock = threading.Lock()  # Sessions initialize providers from their own script threads
+        self._modules = {}  # provider name -> lazily imported SDK module
+        self._inflight = {}  # cache key -> Task of a request still running, shared by identical requests
         self.rate_limits = {
             'openai': {'requests_per_minute': 3500, 'tokens_per_minute': 90000},
             'anthropic': {'requests_per_minute': 5000, 'tokens_per_minute': 100000},
@@ -24,128 +491,246 @@ class AIProviderManager:
             'cohere': {'requests_per_minute': 1000, 'tokens_per_minute': 40000},
             'mistral': {'requests_per_minute': 1000, 'tokens_per_minute': 30000}
         }
+        
+        # Pooled HTTP clients keep TLS connections alive across requests, reruns and sessions
+        self._http = httpx.Client(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        self._ahttp = httpx.AsyncClient(limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT)
+        
+        # Async clients and their connections are bound to one event loop, so every coroutine runs on this one
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="ai-provider-loop", daemon=True).start()
+    
+    def submit(self, coro):
+        """Schedule a coroutine on the manager's event loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+    
+    def _sdk(self, provider_name):
+        """Import a provider SDK on first use and keep the module handle"""
+        module = self._modules.get(provider_name)
+        if module is None:
+            module = self._modules[provider_name] = importlib.import_module(CHAT_MODELS[provider_name].sdk_module)
+        return module
     
     def initialize_provider(self, provider_name, api_key, model):
-        """Initialize a specific AI provider with API key"""
+        """Return the chat model for a provider, API key and model, building its clients on first use
+        
+        Models are kept in a bounded map keyed by a digest of the API key rather than the key itself.
+        """
+        client_key = (provider_name, hashlib.sha256(api_key.encode('utf-8')).hexdigest(), model)
+        with self._providers_lock:
+            provider = self.providers.get(client_key)
+            if provider is not None:
+                self.providers.move_to_end(client_key)
+                return provider
+        
         try:
-            if provider_name == 'openai':
-                client = openai.OpenAI(api_key=api_key)
-                self.providers[provider_name] = {
-                    'client': client,
-                    'model': model,
-                    'type': 'openai'
-                }
-                
-            elif provider_name == 'anthropic':
-                client = anthropic.Anthropic(api_key=api_key)
-                self.providers[provider_name] = {
-                    'client': client,
-                    'model': model,
-                    'type': 'anthropic'
-                }
-                
-            elif provider_name == 'google':
-                genai.configure(api_key=api_key)
-                model_obj = genai.GenerativeModel(model)
-                self.providers[provider_name] = {
-                    'client': model_obj,
-                    'model': model,
-                    'type': 'google'
-                }
-                
-            elif provider_name == 'cohere':
-                client = cohere.Client(api_key=api_key)
-                self.providers[provider_name] = {
-                    'client': client,
-                    'model': model,
-                    'type': 'cohere'
-                }
-                
-            elif provider_name == 'mistral':
-                client = MistralClient(api_key=api_key)
-                self.providers[provider_name] = {
-                    'client': client,
-                    'model': model,
-                    'type': 'mistral'
-                }
-                
-            return True
+            provider = CHAT_MODELS[provider_name].from_sdk(
+                self._sdk(provider_name), api_key, model, self._http, self._ahttp
+            )
         except Exception as e:
-            st.error(f"Error initializing {provider_name}: {str(e)}")
-            return False
-    
-    def generate_transcript(self, provider_name, prompt, form_data):
-        """Generate transcript using the selected AI provider"""
-        if provider_name not in self.providers:
-            st.error(f"Provider {provider_name} not initialized")
-            return None
+            raise GenerationError(provider_name, f"Error initializing: {e}") from e
+        limits = self.rate_limits[provider_name]
+        provider.request_bucket = TokenBucket(limits['requests_per_minute'])
+        provider.token_bucket = TokenBucket(limits['tokens_per_minute'])
         
-        provider = self.providers[provider_name]
-        client = provider['client']
-        model = provider['model']
-        provider_type = provider['type']
+        with self._providers_lock:
+            # Another session may have built the same model meanwhile; keep the first so rate limits stay shared
+            provider = self.providers.setdefault(client_key, provider)
+            self.providers.move_to_end(client_key)
+            while len(self.providers) > PROVIDER_CLIENTS_MAX:
+                self.providers.popitem(last=False)
+        return provider
+    
+    def generate_transcript(self, provider, prompt, form_data):
+        """Generate transcript with a chat model from initialize_provider, serving repeats from the response cache
         
+        Returns the transcript, or a GenerationError for the caller to report.
+        """
         try:
-            max_tokens = calculate_word_count(form_data['duration']) * 1.5  # Approx tokens
-            
-            if provider_type == 'openai':
-                response = client.chat.completions.create(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=max_tokens,
-                    temperature=0.7
-                )
-                return response.choices[0].message.content
-            
-            elif provider_type == 'anthropic':
-                response = client.messages.create(
-                    model=model,
-                    max_tokens=max_tokens,
-                    temperature=0.7,
-                    messages=[{"role": "user", "content": prompt}]
-                )
-                return response.content[0].text
-            
-            elif provider_type == 'google':
-                response = client.generate_content(prompt)
-                return response.text if hasattr(response, 'text') else str(response)
-            
-            elif provider_type == 'cohere':
-                response = client.generate(
-                    model=model,
-                    prompt=prompt,
-                    max_tokens=max_tokens,
-                    temperature=0.7
-                )
-                return response.generations[0].text
-            
-            elif provider_type == 'mistral':
-                # Refined Mistral API call based on version 1.9.2
-                response = client.chat(
-                    model=model,
-                    messages=[{"role": "user", "content": prompt}],
-                    temperature=0.7
-                )
-                st.write(f"Debug: Mistral response structure: {response}")  # Log response for debugging
-                if response and hasattr(response, 'choices') and response.choices:
-                    return response.choices[0].message.content
-                else:
-                    st.error(f"Mistral API response invalid or empty: {str(response)}")
-                    return self._simulate_transcript(prompt, form_data)
-            
-            return None
+            return self.submit(self.agenerate_transcript(provider, prompt, form_data)).result()
         except Exception as e:
-            st.error(f"Error generating transcript with {provider_name}: {str(e)}")
-            if provider_type == 'mistral':  # Fallback for Mistral
+            return GenerationError.from_exception(provider.type, e)
+    
+    def generate_transcript_stream(self, provider, prompt, form_data, max_tokens=None, system=None):
+        """Yield transcript text as it streams in, for synchronous callers such as st.write_stream"""
+        chunks = queue.Queue()
+        
+        async def pump():
+            try:
+                async for chunk in self.astream_transcript(provider, prompt, form_data, max_tokens, system):
+                    chunks.put(chunk)
+            finally:
+                chunks.put(None)
+        
+        future = self.submit(pump())
+        try:
+            while (chunk := chunks.get()) is not None:
+                yield chunk
+            future.result()  # Surface any provider error
+        finally:
+            future.cancel()  # Stop the request if the caller stops reading early
+    
+    async def agenerate_transcript(self, provider, prompt, form_data, max_tokens=None, system=None):
+        """Generate a complete transcript with the provider's async client, serving repeats from the response cache
+        
+        A system prefix shared by several requests is sent separately so providers can cache it server-side.
+        Concurrent identical requests share a single API call.
+        """
+        max_tokens = output_budget(provider.model, form_data, estimate_tokens(prompt, system), max_tokens)
+        
+        cache_prompt = _combine_prompt(system, prompt)
+        cache = get_response_cache()
+        cache_key = cache.make_key(provider.type, provider.model, cache_prompt, max_tokens, TEMPERATURE)
+        cache_scope = None  # The whole prompt is user-editable, so only an exact repeat may be reused
+        cached = await asyncio.to_thread(cache.get, cache_key, cache_prompt, cache_scope)
+        if cached is not None:
+            return cached
+        
+        async def request():
+            try:
+                transcript = await self._arequest_transcript(provider, provider.format(prompt, max_tokens, system))
+            except Exception as e:
+                # A retryable error reaching here means the retries ran out; only then does the provider fall back
+                if not (provider.simulate_on_exhaustion and is_retryable(e)):
+                    raise
                 return self._simulate_transcript(prompt, form_data)
-            return None
+            if transcript:
+                await asyncio.to_thread(cache.set, cache_key, cache_prompt, cache_scope, transcript)
+            return transcript
+        
+        # Every request runs on the manager's loop, so an identical one already in flight can simply be awaited.
+        # The shared call is its own task that every caller, the first included, awaits through a shield, so
+        # cancelling one caller never cancels the call under the others.
+        inflight = self._inflight.get(cache_key)
+        if inflight is None:
+            inflight = self._inflight[cache_key] = asyncio.create_task(request())
+            inflight.add_done_callback(lambda task: self._release_inflight(cache_key, task))
+        return await asyncio.shield(inflight)
+    
+    def _release_inflight(self, cache_key, task):
+        """Forget a finished shared request, marking its error retrieved in case every caller was cancelled"""
+        if self._inflight.get(cache_key) is task:
+            del self._inflight[cache_key]
+        if not task.cancelled():
+            task.exception()
+    
+    async def _throttle(self, provider, payload, n=1):
+        """Wait for request and token budget under the provider's per-minute rate limits"""
+        await provider.request_bucket.acquire(1 if provider.supports_n else n)
+        await provider.token_bucket.acquire(payload['input_tokens'] + n * payload['max_tokens'])
+    
+    async def _arequest_transcript(self, provider, payload, n=None):
+        """Request a complete transcript, or a list of n completions, retrying transient errors"""
+        for attempt in range(RETRY_ATTEMPTS):
+            await self._throttle(provider, payload, n=n or 1)
+            try:
+                if n is None:
+                    return await provider.acall(payload)
+                return await provider.acall_n(payload, n)
+            except Exception as e:
+                if attempt == RETRY_ATTEMPTS - 1 or not is_retryable(e):
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning("%s request failed (%s); retrying in %.1fs", provider.type, e, delay)
+                await asyncio.sleep(delay)
+    
+    async def astream_transcript(self, provider, prompt, form_data, max_tokens=None, system=None, scope_text=None):
+        """Stream transcript text from the selected AI provider, serving repeats from the response cache
+        
+        A system prefix shared by several requests is sent separately so providers can cache it server-side.
+        Near-identical prompts reuse a cached transcript only when scope_text, the part of the request that
+        must match exactly, is given and unchanged; otherwise only exact repeats are served from the cache.
+        """
+        max_tokens = output_budget(provider.model, form_data, estimate_tokens(prompt, system), max_tokens)
+        
+        cache_prompt = _combine_prompt(system, prompt)
+        cache = get_response_cache()
+        cache_key = cache.make_key(provider.type, provider.model, cache_prompt, max_tokens, TEMPERATURE)
+        cache_scope = None
+        if scope_text is not None:
+            cache_scope = cache.make_scope(form_data, provider.model, max_tokens, TEMPERATURE, scope_text)
+        # MinHash and SQLite calls block, so cache lookups and stores run off the shared event loop
+        cached = await asyncio.to_thread(cache.get, cache_key, cache_prompt, cache_scope)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            async for chunk in self._astream_provider(provider, provider.format(prompt, max_tokens, system)):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            # As for complete requests, a stream that never started and outlasted its retries may fall back
+            if chunks or not (provider.simulate_on_exhaustion and is_retryable(e)):
+                raise
+            yield self._simulate_transcript(prompt, form_data)
+            return
+        
+        if chunks:
+            await asyncio.to_thread(cache.set, cache_key, cache_prompt, cache_scope, "".join(chunks))
+    
+    async def agenerate_n(self, provider, prompt, form_data, n, max_tokens):
+        """Generate n completions of one prompt, paying for its input tokens once where the provider allows it"""
+        max_tokens = output_budget(provider.model, form_data, estimate_tokens(prompt), max_tokens)
+        
+        # The completion count is part of the request, so it is part of the cache key
+        cache_prompt = f"{prompt}\n[n={n}]"
+        cache = get_response_cache()
+        cache_key = cache.make_key(provider.type, provider.model, cache_prompt, max_tokens, TEMPERATURE)
+        cache_scope = None  # The persona prompt follows from the form data, so there are no near-duplicates to reuse
+        cached = await asyncio.to_thread(cache.get, cache_key, cache_prompt, cache_scope)
+        if cached is not None:
+            return cached
+        
+        completions = await self._arequest_transcript(provider, provider.format(prompt, max_tokens), n=n)
+        await asyncio.to_thread(cache.set, cache_key, cache_prompt, cache_scope, completions)
+        return completions
+    
+    async def _astream_provider(self, provider, payload):
+        """Stream transcript chunks from the provider's async client
+        
+        Transient errors are retried only until the first chunk arrives; after that a retry would repeat text.
+        """
+        for attempt in range(RETRY_ATTEMPTS):
+            await self._throttle(provider, payload)
+            started = False
+            try:
+                async for chunk in provider.astream(payload):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or attempt == RETRY_ATTEMPTS - 1 or not is_retryable(e):
+                    raise
+                delay = retry_delay(attempt)
+                logger.warning("%s stream failed (%s); retrying in %.1fs", provider.type, e, delay)
+                await asyncio.sleep(delay)
+    
+    def submit_batch(self, provider, variants):
+        """Submit (prompt, form_data) variants to the provider's batch API and return the batch id"""
+        return provider.submit_batch([
+            (str(index), prompt, output_budget(provider.model, form_data, estimate_tokens(prompt)))
+            for index, (prompt, form_data) in enumerate(variants)
+        ])
+    
+    def retrieve_batch(self, provider, batch_id):
+        """Check a submitted batch; returns (status, {variant index: transcript}) with results once complete"""
+        return provider.retrieve_batch(batch_id)
     
     def _simulate_transcript(self, prompt, form_data):
-        """Fallback to simulate a transcript if API call fails"""
-        st.warning("API call failed. Generating simulated transcript as fallback.")
-        duration = form_data['duration']
-        estimated_words = calculate_word_count(duration)
-        return f"""[00:00] MODERATOR: Welcome to the focus group on {form_data['topic']}. This is a simulated transcript due to API failure.
-[00:05] PARTICIPANT 1: This is a placeholder response with about {estimated_words // 10} words.
-[00:10] PARTICIPANT 2: Another response here, adding more context.
-... (Transcript continues for {duration} minutes with ~{estimated_words} words total)"""
+        """Fallback to simulate a transcript once retries against the provider are exhausted"""
+        logger.warning("Provider retries exhausted; generating simulated transcript as fallback")
+        estimated_words = calculate_word_count(form_data['duration'])
+        fields = {
+            'topic': form_data['topic'],
+            'duration': form_data['duration'],
+            'estimated_words': estimated_words,
+            'turn_words': estimated_words // 10
+        }
+        return "\n".join(line.format_map(fields) for line in SIMULATED_TRANSCRIPT_LINES)
+
+@st.cache_resource(show_spinner=False)
+def get_provider_manager():
+    """The one provider manager of the process, shared by every session so its event loop and pools stay warm"""
+    return AIProviderManager()
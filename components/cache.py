@@ -0,0 +1,246 @@
+"""
+Response caching for the Focus Group Generator
+"""
+
+import hashlib
+import random
+import re
+import sqlite3
+import struct
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+import orjson
+import streamlit as st
+
+CACHE_PATH = ".llm_cache.sqlite3"
+
+# Cached completions expire after a day; the in-memory layer keeps the most recent entries
+CACHE_TTL_SECONDS = 86400
+MEMORY_MAX_ENTRIES = 1000
+
+# The on-disk cache keeps at most this many completions, dropping the least recently used first;
+# the limit is enforced at start-up and again after every DISK_TRIM_INTERVAL stores
+DISK_MAX_ENTRIES = 10000
+DISK_TRIM_INTERVAL = 100
+
+# Near-duplicate prompts at or above this estimated similarity reuse a cached completion
+SIMILARITY_THRESHOLD = 0.97
+
+# MinHash settings: word 3-gram shingles hashed through 64 fixed permutations
+SHINGLE_SIZE = 3
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1729)
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(64)]
+
+def form_data_key(form_data):
+    """
+    Build a hashable key from form data
+    """
+    return tuple(sorted(
+        (key, tuple(value) if isinstance(value, list) else value)
+        for key, value in form_data.items()
+    ))
+
+@lru_cache(maxsize=256)
+def _form_digest(form_items):
+    return hashlib.blake2b(repr(form_items).encode('utf-8'), digest_size=16).hexdigest()
+
+def form_data_digest(form_data):
+    """
+    Canonical digest of form data, hashed once per distinct study
+    """
+    return _form_digest(form_data_key(form_data))
+
+def _hash(*parts):
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_prompt(prompt):
+    """
+    Normalize a prompt for exact-match caching: case-insensitive, whitespace collapsed
+    """
+    return _WHITESPACE_RE.sub(" ", prompt).strip().casefold()
+
+def minhash_signature(text):
+    """
+    Compute a MinHash signature over word shingles for near-duplicate detection
+    """
+    words = text.split()
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = [
+        int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for shingle in shingles
+    ]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS)
+
+def _pack_signature(signature):
+    return struct.pack(f">{len(signature)}Q", *signature)
+
+def _unpack_signature(blob):
+    return struct.unpack(f">{len(blob) // 8}Q", blob)
+
+def estimate_similarity(signature_a, signature_b):
+    """
+    Estimate the Jaccard similarity of two texts from their MinHash signatures
+    """
+    matches = sum(1 for a, b in zip(signature_a, signature_b) if a == b)
+    return matches / len(signature_a)
+
+class ResponseCache:
+    """SQLite-backed cache of AI completions with an in-memory LRU layer and a near-duplicate prompt fallback"""
+    
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL_SECONDS, max_entries=MEMORY_MAX_ENTRIES,
+                 max_disk_entries=DISK_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()  # key -> (created, completion), least recently used first
+        self._stores_since_trim = 0
+        self._lock = threading.Lock()
+        
+        # One connection shared across threads; every use is serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS completions"
+                " (key TEXT PRIMARY KEY, completion BLOB, created REAL, used REAL)"
+            )
+            # Cache files written before last-use tracking lack the used column
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(completions)")}
+            if 'used' not in columns:
+                self._db.execute("ALTER TABLE completions ADD COLUMN used REAL")
+                self._db.execute("UPDATE completions SET used = created")
+            self._db.execute("CREATE INDEX IF NOT EXISTS completions_used ON completions (used)")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS signatures (scope TEXT, key TEXT, signature BLOB)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS signatures_scope ON signatures (scope)")
+            self._trim_disk()
+    
+    def make_key(self, provider, model, prompt, max_tokens, temperature):
+        """Exact-match key for a completion request, insensitive to case and whitespace in the prompt"""
+        return _hash(provider, model, max_tokens, temperature, normalize_prompt(prompt))
+    
+    def make_scope(self, form_data, model, max_tokens, temperature, variant):
+        """Scope for near-duplicate matching: same study, model, request shape and variant
+        
+        The variant is the text that must match exactly, such as the user-editable prompt and the section it
+        asks for, so only the remaining parts of a prompt (a regenerated roster, say) may differ.
+        """
+        return _hash(form_data_digest(form_data), model, max_tokens, temperature, variant)
+    
+    def get(self, key, prompt, scope):
+        """Return a cached completion for the exact prompt, or for a near-identical one in the same scope
+        
+        A scope of None restricts the lookup to exact matches.
+        """
+        with self._lock:
+            completion = self._memory_get(key)
+            if completion is not None:
+                self._touch(key)
+                return completion
+            
+            cutoff = time.time() - self.ttl
+            row = self._db.execute(
+                "SELECT completion, created FROM completions WHERE key = ? AND created > ?", (key, cutoff)
+            ).fetchone()
+            if row is not None:
+                completion = orjson.loads(row[0])
+                self._memory_set(key, completion, row[1])
+                self._touch(key)
+                return completion
+            
+            if scope is None:
+                return None
+            
+            candidates = self._db.execute(
+                "SELECT signatures.signature, completions.key, completions.completion FROM signatures"
+                " JOIN completions ON completions.key = signatures.key"
+                " WHERE signatures.scope = ? AND completions.created > ?",
+                (scope, cutoff)
+            ).fetchall()
+        
+        if not candidates:
+            return None
+        
+        signature = minhash_signature(prompt)
+        best_key, best_completion, best_similarity = None, None, 0.0
+        for candidate_signature, candidate_key, candidate_completion in candidates:
+            similarity = estimate_similarity(signature, _unpack_signature(candidate_signature))
+            if similarity > best_similarity:
+                best_key, best_completion, best_similarity = candidate_key, candidate_completion, similarity
+        
+        if best_similarity >= SIMILARITY_THRESHOLD:
+            with self._lock:
+                self._touch(best_key)
+            return orjson.loads(best_completion)
+        return None
+    
+    def set(self, key, prompt, scope, completion):
+        """Store a completion and, unless scope is None, index its prompt signature for near-duplicate lookups"""
+        created = time.time()
+        signature = None if scope is None else _pack_signature(minhash_signature(prompt))
+        with self._lock, self._db:
+            self._memory_set(key, completion, created)
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, completion, created, used) VALUES (?, ?, ?, ?)",
+                (key, orjson.dumps(completion), created, created)
+            )
+            self._db.execute("DELETE FROM signatures WHERE key = ?", (key,))
+            if signature is not None:
+                self._db.execute(
+                    "INSERT INTO signatures (scope, key, signature) VALUES (?, ?, ?)", (scope, key, signature)
+                )
+            
+            # The cache lives as long as the process, so the disk limit is enforced as it fills too
+            self._stores_since_trim += 1
+            if self._stores_since_trim >= DISK_TRIM_INTERVAL:
+                self._trim_disk()
+    
+    def _trim_disk(self):
+        """Drop expired completions, then the least recently used beyond the disk limit, and their signatures
+        
+        Callers hold the lock inside a transaction.
+        """
+        self._stores_since_trim = 0
+        cutoff = time.time() - self.ttl
+        self._db.execute("DELETE FROM completions WHERE created <= ?", (cutoff,))
+        self._db.execute(
+            "DELETE FROM completions WHERE key NOT IN"
+            " (SELECT key FROM completions ORDER BY used DESC LIMIT ?)", (self.max_disk_entries,)
+        )
+        self._db.execute("DELETE FROM signatures WHERE key NOT IN (SELECT key FROM completions)")
+    
+    def _touch(self, key):
+        """Record a cache hit so eviction drops the least recently used completions first"""
+        with self._db:
+            self._db.execute("UPDATE completions SET used = ? WHERE key = ?", (time.time(), key))
+    
+    def _expired(self, created):
+        return time.time() - created > self.ttl
+    
+    def _memory_get(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if self._expired(entry[0]):
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+    
+    def _memory_set(self, key, completion, created):
+        self._memory[key] = (created, completion)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+@st.cache_resource(show_spinner=False)
+def get_response_cache():
+    """Shared response cache for all sessions in this process"""
+    return ResponseCache()
@@ -0,0 +1,75 @@
+"""
+Prompt templates for the Focus Group Generator
+"""
+
+# Research prompt shown on the review page; filled with str.format_map.
+# The study-independent sections come first so every study's prompt shares the same opening text,
+# which providers can serve from their prompt-prefix cache; study-specific fields follow.
+PROMPT_TEMPLATE = """FOCUS GROUP DISCUSSION GENERATOR PROMPT
+
+MODERATOR BEHAVIOR:
+- Maintain neutrality throughout
+- Use probing questions: "Can you tell me more about that?", "What do others think?"
+- Manage participation: encourage quiet members, tactfully redirect dominant ones
+- Bridge between topics smoothly
+- Summarize and reflect back key points
+
+OUTPUT FORMAT:
+Generate a realistic focus group transcript with:
+- Timestamp markers every 5-10 minutes
+- Speaker identification (Moderator, Participant names)
+- Natural conversation flow
+- Realistic pace and word count distribution
+- Cultural authenticity and local relevance
+
+STUDY CONFIGURATION:
+- Participants: {num_participants} total ({male_count}M, {female_count}F, {non_binary_count}NB)
+- Age Range: {age_range}
+- Demographics: {demographics}
+- Topic: {topic}
+- Objective: {objective}
+- Duration: {duration} minutes (Target: ~{estimated_words:,} words)
+- Location: {location}
+- Type: {discussion_type}
+- Languages: {languages_str}
+
+{study_document_section}RESEARCH REQUIREMENTS:
+1. Research the topic "{topic}" thoroughly for {location}
+2. Understand local market conditions, cultural nuances, and recent developments
+3. Generate realistic participant personas based on demographics and location
+4. Create natural conversation flow with local dialects and speech patterns
+
+TRANSCRIPT STRUCTURE:
+1. Opening (15% - {opening_words:,} words):
+   - Welcome and introductions
+   - Ground rules and recording consent
+   - Overview of discussion
+
+2. Warm-up (10% - {warmup_words:,} words):
+   - Icebreaker questions
+   - General topic introduction
+
+3. Core Discussion (65% - {core_words:,} words):
+   - Main research questions
+   - Deep probing and follow-ups
+   - Natural participant interactions
+
+4. Closing (10% - {closing_words:,} words):
+   - Summary of key points
+   - Final thoughts
+   - Thank you and wrap-up
+
+NATURAL SPEECH REQUIREMENTS:
+- Include natural speech patterns: "umm", "you know", "like"
+- Add grammatical imperfections and hesitations
+- Use local references and cultural context from {location}
+- Include appropriate dialect/accent markers for {languages_slash}
+- Show realistic group dynamics (interruptions, agreements, disagreements)
+
+PARTICIPANT PERSONAS:
+Generate {num_participants} distinct personalities with:
+- Realistic names appropriate for {location}
+- Varied speaking styles and opinions
+- Different levels of engagement
+- Authentic demographic representation
+"""
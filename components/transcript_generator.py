@@ -4,274 +4,598 @@ Handles the core logic for generating realistic focus group transcripts
 """
 
 import streamlit as st
+import asyncio
+import re
 import requests
-import json
 import time
 from datetime import datetime
-from .ai_providers import AIProviderManager
-from .utils import calculate_word_count
+from functools import lru_cache
+from itertools import chain, cycle, islice
+from .ai_providers import GenerationError, get_provider_manager
+from .cache import form_data_key
+from .utils import TRANSCRIPT_SECTIONS, calculate_word_count, count_words
 
-class TranscriptGenerator:
-    """Core transcript generation engine"""
-    
-    def __init__(self):
-        self.ai_manager = AIProviderManager()
-        self.research_cache = {}
-        
-    def generate_full_transcript(self, form_data, api_config, generated_prompt):
-        """Generate complete focus group transcript"""
-        
-        # Initialize AI provider
-        provider_name = api_config['provider']
-        api_key = api_config['api_key']
-        model = api_config['model']
-        
-        success = self.ai_manager.initialize_provider(provider_name, api_key, model)
-        if not success:
-            raise Exception(f"Failed to initialize {provider_name}")
-        
-        # Enhance prompt with research data
-        enhanced_prompt = self._enhance_prompt_with_research(generated_prompt, form_data)
-        
-        # Generate transcript
-        transcript = self.ai_manager.generate_transcript(
-            provider_name, 
-            enhanced_prompt, 
-            form_data
-        )
-        
-        if not transcript:
-            raise Exception("Failed to generate transcript")
-        
-        # Post-process transcript
-        processed_transcript = self._post_process_transcript(transcript, form_data)
-        
-        return processed_transcript
-    
-    def _enhance_prompt_with_research(self, base_prompt, form_data):
-        """Enhance the prompt with research data about the topic and location"""
-        
-        topic = form_data.get('topic', '')
-        location = form_data.get('location', '')
-        languages = form_data.get('languages', ['English'])
-        
-        # Research topic online (simplified - in production you'd use real web search)
-        research_data = self._research_topic(topic, location)
-        
-        # Get cultural context
-        cultural_context = self._get_cultural_context(location, languages)
-        
-        # Get language-specific patterns
-        language_patterns = self._get_language_patterns(languages, location)
-        
-        enhanced_prompt = f"""{base_prompt}
+# Words of the core discussion handed to the closing section for continuity
+CONTINUITY_WORDS = 500
 
-RESEARCH INSIGHTS:
-{research_data}
+# Token budget for each participant persona blurb
+PERSONA_MAX_TOKENS = 120
 
-CULTURAL CONTEXT FOR {location.upper()}:
-{cultural_context}
-
-LANGUAGE PATTERNS:
-{language_patterns}
-
-ADDITIONAL INSTRUCTIONS:
+# Instructions prepended to every research-enhanced prompt. They never vary between studies, so keeping
+# them (and the static head of the base prompt) byte-identical at the start lets providers reuse the
+# cached prompt prefix; anything topic- or location-specific must come after them.
+RESEARCH_INSTRUCTIONS = """ADDITIONAL INSTRUCTIONS:
 - Incorporate the research insights naturally into participant responses
 - Use cultural references and local knowledge appropriately
 - Apply language patterns and dialect markers as specified
 - Ensure responses reflect real market conditions and local perspectives
 - Include realistic local references (transportation, food, places, etc.)
 """
-        
-        return enhanced_prompt
-    
-    def _research_topic(self, topic, location):
-        """Research the topic for the specific location (simplified version)"""
-        
-        # In production, this would use web search APIs
-        # For now, we'll provide contextual guidance based on common topics
-        
-        research_templates = {
-            'electric vehicle': {
-                'india': """
+
+# Transcripts generated at once by batch_generate; the provider rate limits still apply on top
+BATCH_MAX_CONCURRENCY = 8
+
+# Metadata block placed above every finished transcript, filled in with format_map
+TRANSCRIPT_HEADER = """FOCUS GROUP DISCUSSION TRANSCRIPT
+
+Study Information:
+- Topic: {topic}
+- Date: {date}
+- Duration: {duration} minutes
+- Location: {location}
+- Type: {discussion_type_upper}
+- Languages: {languages_joined}
+
+Participant Demographics:
+- Total Participants: {num_participants}
+- Gender Distribution: {male_count}M, {female_count}F, {non_binary_count}NB
+- Age Range: {age_range}
+- Profile: {demographics}
+
+Study Objective:
+{objective}
+
+Expected Word Count: ~{estimated_words:,} words
+Transcript Status: Generated using AI simulation
+
+""" + '=' * 80
+
+# Line classifiers, matched case-insensitively anywhere in the line
+_SPEAKER_RE = re.compile(r"MODERATOR|P[1-8]", re.IGNORECASE)  # Dialogue lines that can take a timestamp
+_MODERATOR_RE = re.compile(r"MODERATOR", re.IGNORECASE)
+_PARTICIPANT_RE = re.compile(r"PARTICIPANT|P[1-3]", re.IGNORECASE)
+# A line already carrying a timestamp: opens with '[' and contains a ']' and a digit
+_TS_RE = re.compile(r"\s*\[(?=.*\])(?=.*\d)")
+
+# Quality-check phrases, searched case-insensitively as whole words so the transcript is never
+# lowercased as a whole and short markers such as "na" do not match inside other words. Both marker
+# groups share one alternation, so a single scan settles the natural-flow and cultural checks together.
+_SPEECH_MARKERS_RE = re.compile(
+    r"\b(?:(?P<natural>umm|uh|you know|like|actually|i think|well)"
+    r"|(?P<indian>yaar|na|arre|bas|tension|time pass))\b",
+    re.IGNORECASE
+)
+_OPENING_KEYWORDS = frozenset({'welcome', 'introduction', 'begin', 'start', 'good morning', 'good evening'})
+_CLOSING_KEYWORDS = frozenset({'thank you', 'conclude', 'wrap up', 'final thoughts', 'end'})
+
+# Topic research notes by topic keyword, then by location keyword ('global' when no location matches)
+RESEARCH_TEMPLATES = {
+    'electric vehicle': {
+        'india': """
 - India's EV market is growing rapidly with government push for 2030 targets
 - Major concerns: charging infrastructure, price, range anxiety
 - Local players: Tata Motors, Mahindra, Hero Electric
 - Government incentives: FAME II scheme, state subsidies
 - Cultural factors: joint family decisions, value for money mindset
-                """,
-                'france': """
+        """,
+        'france': """
 - France has strong EV adoption with extensive charging network
 - Government banned ICE sales by 2040
 - Popular models: Renault Zoe, Peugeot e-208
 - Concerns: battery replacement costs, winter performance
 - Cultural factors: environmental consciousness, government trust
-                """,
-                'usa': """
+        """,
+        'usa': """
 - Tesla dominance with growing competition from traditional automakers
 - State-level incentives vary significantly
 - Range anxiety decreasing with better infrastructure
 - Cultural factors: truck culture in rural areas, tech adoption in cities
-                """
-            },
-            'food delivery': {
-                'india': """
+        """
+    },
+    'food delivery': {
+        'india': """
 - Dominated by Zomato and Swiggy
 - Concerns: food quality, delivery time, hygiene
 - Cultural factors: home-cooked food preference, family meal importance
 - Local challenges: address accuracy, payment preferences
-                """,
-                'global': """
+        """,
+        'global': """
 - App-based delivery has changed eating habits
 - Concerns: delivery fees, food temperature, packaging waste
 - Competition from cloud kitchens and direct restaurant apps
-                """
-            }
-        }
-        
-        # Match topic keywords
-        for key in research_templates:
-            if key.lower() in topic.lower():
-                location_key = location.lower()
-                for loc in research_templates[key]:
-                    if loc in location_key:
-                        return research_templates[key][loc]
-                return research_templates[key].get('global', 'No specific research available')
-        
-        return f"Research topic '{topic}' in context of {location} market conditions and consumer behavior"
-    
-    def _get_cultural_context(self, location, languages):
-        """Get cultural context for the location"""
-        
-        cultural_contexts = {
-            'mumbai': """
+        """
+    }
+}
+
+# (lowercased topic keyword, (location keyword, notes) pairs, fallback notes), scanned in order against the topic
+_RESEARCH_KEYS = tuple(
+    (topic_key.lower(), tuple(locations.items()), locations.get('global', 'No specific research available'))
+    for topic_key, locations in RESEARCH_TEMPLATES.items()
+)
+
+# Cultural guidance by city keyword
+CULTURAL_CONTEXTS = {
+    'mumbai': """
 - Fast-paced urban lifestyle, time is precious
 - Mix of traditional and modern values
 - Local references: local trains, traffic, monsoons
 - Communication style: direct but respectful
 - Food culture: street food, tiffin system
-            """,
-            'delhi': """
+    """,
+    'delhi': """
 - Political and business hub mentality
 - Status-conscious culture
 - Local references: metro, pollution, winter/summer extremes
 - Communication style: assertive, hierarchical awareness
-            """,
-            'bangalore': """
+    """,
+    'bangalore': """
 - Tech hub with cosmopolitan outlook
 - Young professional demographic
 - Local references: traffic, pubs, weather
 - Communication style: casual, English-mixed
-            """,
-            'paris': """
+    """,
+    'paris': """
 - Fashion and culture consciousness
 - Quality over quantity mindset
 - Local references: metro, arrondissements, café culture
 - Communication style: intellectual, debate-oriented
-            """,
-            'toronto': """
+    """,
+    'toronto': """
 - Multicultural and polite communication
 - Winter weather impacts
 - Local references: TTC, neighborhoods, hockey
 - Communication style: inclusive, apologetic
-            """,
-            'new york': """
+    """,
+    'new york': """
 - Fast-paced, competitive environment
 - Diverse borough identities
 - Local references: subway, boroughs, seasons
 - Communication style: direct, time-conscious
-            """
-        }
-        
-        location_key = location.lower()
-        for city in cultural_contexts:
-            if city in location_key:
-                return cultural_contexts[city]
-        
-        # Default cultural guidance
-        return f"Consider local cultural norms, communication styles, and references relevant to {location}"
-    
-    def _get_language_patterns(self, languages, location):
-        """Get language-specific speech patterns and dialect markers"""
-        
-        patterns = {
-            'hinglish': """
+    """
+}
+
+_CULTURAL_KEYS = tuple(CULTURAL_CONTEXTS.items())
+
+# Speech patterns by language; English varies by region keyword
+LANGUAGE_PATTERNS = {
+    'hinglish': """
 - Mix English and Hindi naturally: "I think it's accha", "Cost is too much yaar"
 - Use Indian English patterns: "I am doing", "good name", "what is your good name"
 - Include fillers: "na", "yaar", "arre", "bas"
 - Common phrases: "time pass", "tension mat lo", "scene kya hai"
-            """,
-            'hindi': """
+    """,
+    'hindi': """
 - Use Devanagari transliterations when appropriate
 - Include respectful forms: "aap", "ji"
 - Regional variations based on location
 - Natural Hindi sentence structures
-            """,
-            'french': """
+    """,
+    'french': """
 - Include "euh", "ben", "alors" as fillers
 - Use formal/informal variations appropriately
 - Canadian French differences if Quebec location
 - Natural French interruption patterns
-            """,
-            'english': {
-                'india': """
+    """,
+    'english': {
+        'india': """
 - Indian English patterns: "I am having", "good name"
 - Local accent markers: "w" sounds, rhythm patterns
 - Mix of formal and casual based on education level
-                """,
-                'uk': """
+        """,
+        'uk': """
 - British expressions: "brilliant", "quite", "rather"
 - Regional accents if specified
 - Understatement and politeness patterns
-                """,
-                'usa': """
+        """,
+        'usa': """
 - American casual speech: "like", "you know", "totally"
 - Regional variations if location specified
 - Direct communication style
-                """,
-                'canada': """
+        """,
+        'canada': """
 - Canadian markers: "eh", "about" pronunciation
 - Polite communication patterns
 - Multicultural influences
-                """
-            }
+        """
+    }
+}
+
+# Lowercased language -> (region keyword, patterns) pairs scanned in order; '' matches any location
+_LANGUAGE_KEYS = {
+    lang: tuple(patterns.items()) if isinstance(patterns, dict) else (('', patterns),)
+    for lang, patterns in LANGUAGE_PATTERNS.items()
+}
+
+# Participant name pools by region
+NAME_POOLS = {
+    'india': {
+        'male': ['Amit', 'Rajesh', 'Vikram', 'Suresh', 'Kiran', 'Arjun', 'Rohit', 'Deepak'],
+        'female': ['Priya', 'Sneha', 'Kavita', 'Pooja', 'Meera', 'Sunita', 'Anita', 'Ritu'],
+        'surnames': ['Sharma', 'Patel', 'Singh', 'Kumar', 'Gupta', 'Agarwal', 'Jain', 'Shah']
+    },
+    'france': {
+        'male': ['Pierre', 'Jean', 'Michel', 'Alain', 'Philippe', 'Christophe', 'Laurent', 'Éric'],
+        'female': ['Marie', 'Françoise', 'Monique', 'Catherine', 'Sylvie', 'Isabelle', 'Martine', 'Nicole'],
+        'surnames': ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Petit', 'Durand', 'Leroy']
+    },
+    'usa': {
+        'male': ['John', 'Michael', 'David', 'James', 'Robert', 'William', 'Richard', 'Joseph'],
+        'female': ['Mary', 'Patricia', 'Jennifer', 'Linda', 'Elizabeth', 'Barbara', 'Susan', 'Jessica'],
+        'surnames': ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis']
+    }
+}
+
+@lru_cache(maxsize=256)
+def _research_topic(topic, location, topic_lc, location_lc):
+    """Research the topic for the specific location (simplified version)
+    
+    topic_lc and location_lc are the lowercased topic and location, computed once by the caller.
+    """
+    
+    # In production, this would use web search APIs
+    # For now, we'll provide contextual guidance based on common topics
+    
+    # Match topic keywords
+    for topic_key, locations, fallback in _RESEARCH_KEYS:
+        if topic_key in topic_lc:
+            for loc, notes in locations:
+                if loc in location_lc:
+                    return notes
+            return fallback
+    
+    return f"Research topic '{topic}' in context of {location} market conditions and consumer behavior"
+
+@lru_cache(maxsize=256)
+def _get_cultural_context(location, location_lc):
+    """Get cultural context for the location (location_lc is its lowercased form)"""
+    
+    for city, context in _CULTURAL_KEYS:
+        if city in location_lc:
+            return context
+    
+    # Default cultural guidance
+    return f"Consider local cultural norms, communication styles, and references relevant to {location}"
+
+@lru_cache(maxsize=256)
+def _get_language_patterns(languages, location_lc):
+    """Get language-specific speech patterns and dialect markers for a lowercased location"""
+    
+    result = []
+    
+    for lang in languages:
+        regions = _LANGUAGE_KEYS.get(lang.lower())
+        if regions is None:
+            result.append(f"{lang}: Use natural {lang} speech patterns with local dialect variations")
+            continue
+        patterns = next((text for region, text in regions if region in location_lc), None)
+        result.append(f"{lang}: {patterns}" if patterns is not None else f"{lang}: Standard {lang} patterns")
+    
+    return "\n".join(result)
+
+@lru_cache(maxsize=256)
+def _research_enhanced_prompt(base_prompt, form_items):
+    """Enhance the prompt with research data about the topic and location, given form data as form_data_key(form_data)"""
+    
+    form_data = dict(form_items)
+    topic = form_data.get('topic', '')
+    location = form_data.get('location', '')
+    languages = tuple(form_data.get('languages', ['English']))  # Hashable for the cached lookups below
+    
+    # Lowercase once for every keyword lookup below
+    topic_lc = topic.lower()
+    location_lc = location.lower()
+    
+    # Research topic online (simplified - in production you'd use real web search)
+    research_data = _research_topic(topic, location, topic_lc, location_lc)
+    
+    # Get cultural context
+    cultural_context = _get_cultural_context(location, location_lc)
+    
+    # Get language-specific patterns
+    language_patterns = _get_language_patterns(languages, location_lc)
+    
+    # Static instructions first and study-specific research last, keeping the prompt prefix cacheable
+    enhanced_prompt = f"""{RESEARCH_INSTRUCTIONS}
+{base_prompt}
+
+RESEARCH INSIGHTS:
+{research_data}
+
+CULTURAL CONTEXT FOR {location.upper()}:
+{cultural_context}
+
+LANGUAGE PATTERNS:
+{language_patterns}
+"""
+    
+    return enhanced_prompt
+
+def _stream_lines(chunks):
+    """Regroup streamed text chunks into complete lines, yielding each line as soon as it ends"""
+    
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        if '\n' in chunk:
+            *lines, buffer = buffer.split('\n')
+            yield from lines
+    if buffer:
+        yield buffer
+
+class TranscriptGenerator:
+    """Core transcript generation engine"""
+    
+    def __init__(self, ai_manager=None):
+        self.ai_manager = ai_manager or get_provider_manager()
+        
+    def generate_full_transcript(self, form_data, api_config, generated_prompt):
+        """Generate complete focus group transcript"""
+        
+        provider, enhanced_prompt = self._prepare_generation(form_data, api_config, generated_prompt)
+        
+        # Stream the transcript and post-process each line as soon as it is complete
+        try:
+            lines = _stream_lines(
+                self.ai_manager.generate_transcript_stream(provider, enhanced_prompt, form_data)
+            )
+            first_line = next(lines, None)
+            if first_line is None:
+                raise Exception("Failed to generate transcript")
+            
+            return self._post_process_lines(chain((first_line,), lines), form_data)
+        except GenerationError:
+            raise
+        except Exception as e:
+            raise GenerationError.from_exception(provider.type, e) from e
+    
+    async def agenerate_full_transcript(self, form_data, api_config, generated_prompt):
+        """Generate complete focus group transcript with the provider's async client"""
+        
+        provider, enhanced_prompt = self._prepare_generation(form_data, api_config, generated_prompt)
+        transcript = await self.ai_manager.agenerate_transcript(provider, enhanced_prompt, form_data)
+        
+        return self.finalize_transcript(transcript, form_data)
+    
+    async def batch_generate(self, variants, api_config, max_concurrency=BATCH_MAX_CONCURRENCY):
+        """Generate complete transcripts for (prompt, form_data) variants concurrently
+        
+        Failed and cancelled variants come back as a GenerationError instead of failing the whole batch.
+        """
+        
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate(generated_prompt, form_data):
+            async with semaphore:
+                return await self.agenerate_full_transcript(form_data, api_config, generated_prompt)
+        
+        outcomes = await asyncio.gather(
+            *(generate(generated_prompt, form_data) for generated_prompt, form_data in variants),
+            return_exceptions=True
+        )
+        # CancelledError is a BaseException, so checking for Exception alone would pass it through as a result
+        return [
+            GenerationError.from_exception(api_config['provider'], outcome)
+            if isinstance(outcome, BaseException) else outcome
+            for outcome in outcomes
+        ]
+    
+    def submit_batch(self, variants, api_config):
+        """Submit (prompt, form_data) variants to the provider's batch API and return the batch id
+        
+        Each prompt gets the same research enhancement as a single transcript before it is queued.
+        """
+        
+        enhanced_variants = []
+        for generated_prompt, form_data in variants:
+            provider, enhanced_prompt = self._prepare_generation(form_data, api_config, generated_prompt)
+            enhanced_variants.append((enhanced_prompt, form_data))
+        
+        return self.ai_manager.submit_batch(provider, enhanced_variants)
+    
+    def poll_batch(self, batch_id, form_data_list, api_config):
+        """Check a submitted batch; returns (status, {variant index: finalized transcript}) once complete"""
+        
+        provider = self.ai_manager.initialize_provider(
+            api_config['provider'], api_config['api_key'], api_config['model']
+        )
+        
+        status, results = self.ai_manager.retrieve_batch(provider, batch_id)
+        if results is None:
+            return status, None
+        
+        return status, {
+            index: self.finalize_transcript(transcript, form_data_list[index])
+            for index, transcript in results.items()
         }
+    
+    async def astream_transcript(self, form_data, api_config, generated_prompt):
+        """Stream (section index, chunk) pairs while the transcript sections are generated concurrently
         
-        result = []
-        location_lower = location.lower()
-        
-        for lang in languages:
-            lang_lower = lang.lower()
-            if lang_lower in patterns:
-                if isinstance(patterns[lang_lower], dict):
-                    # Handle English with regional variations
-                    for region in patterns[lang_lower]:
-                        if region in location_lower:
-                            result.append(f"{lang}: {patterns[lang_lower][region]}")
-                            break
-                    else:
-                        result.append(f"{lang}: Standard {lang} patterns")
-                else:
-                    result.append(f"{lang}: {patterns[lang_lower]}")
-            else:
-                result.append(f"{lang}: Use natural {lang} speech patterns with local dialect variations")
+        The opening, warm-up and core discussion are requested in parallel. The closing
+        section waits for the core discussion so it can continue from its last words.
+        """
         
-        return "\n".join(result)
+        provider, enhanced_prompt = self._prepare_generation(form_data, api_config, generated_prompt)
+        roster = await self._build_participant_roster(provider, form_data)
+        shared_prefix = self._build_shared_prefix(enhanced_prompt, roster)
+        estimated_words = calculate_word_count(form_data['duration'])
+        
+        *leading_sections, closing_section = range(len(TRANSCRIPT_SECTIONS))
+        section_chunks = [[] for _ in TRANSCRIPT_SECTIONS]
+        queue = asyncio.Queue()
+        
+        async def stream_section(index, previous_text=""):
+            ratio = TRANSCRIPT_SECTIONS[index][1]
+            prompt = self._build_section_prompt(index, estimated_words, previous_text)
+            async for chunk in self.ai_manager.astream_transcript(
+                provider,
+                prompt,
+                form_data,
+                max_tokens=int(estimated_words * ratio * 1.5),  # Approx tokens
+                system=shared_prefix,
+                # Near-duplicate reuse only across roster and continuity changes, never across sections or prompt edits
+                scope_text=f"{index}\n{enhanced_prompt}"
+            ):
+                section_chunks[index].append(chunk)
+                await queue.put((index, chunk))
+        
+        async def stream_core_then_closing():
+            core_section = leading_sections[-1]
+            await stream_section(core_section)
+            core_words = "".join(section_chunks[core_section]).split()
+            await stream_section(closing_section, " ".join(core_words[-CONTINUITY_WORDS:]))
+        
+        async def stream_all_sections():
+            tasks = [asyncio.create_task(stream_section(index)) for index in leading_sections[:-1]]
+            tasks.append(asyncio.create_task(stream_core_then_closing()))
+            try:
+                await asyncio.gather(*tasks)
+            finally:
+                # gather does not cancel the other sections when one fails; stop them paying for unread tokens
+                for task in tasks:
+                    task.cancel()
+                await queue.put(None)
+        
+        runner = asyncio.create_task(stream_all_sections())
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+            
+            # Surface any provider error raised while the sections were streaming
+            await runner
+        finally:
+            # Stop outstanding section requests if the consumer stops early or is cancelled
+            runner.cancel()
+    
+    async def _build_participant_roster(self, provider, form_data):
+        """Fix participants up front so concurrently generated sections agree on who is speaking"""
+        
+        count = form_data['num_participants']
+        names = generate_participant_names(
+            count,
+            form_data['location'],
+            {'male': form_data['male_count'], 'female': form_data['female_count']}
+        )
+        names += [f"Participant {i}" for i in range(len(names) + 1, count + 1)]
+        
+        # One request returns a persona per participant, so the shared prompt is only paid for once
+        persona_prompt = f"""Create one participant persona for a focus group on "{form_data['topic']}" in {form_data['location']}.
+Participant profile: {form_data['demographics']}; age range {form_data['age_range']}.
+In one or two sentences describe their age, occupation, attitude towards the topic and speaking style.
+Do not include a name or gendered pronouns."""
+        
+        try:
+            personas = await self.ai_manager.agenerate_n(
+                provider, persona_prompt, form_data, n=count, max_tokens=PERSONA_MAX_TOKENS
+            )
+        except Exception:
+            # Personas only enrich the roster; the names alone keep sections consistent
+            return "\n".join(f"- {name}" for name in names)
+        
+        return "\n".join(
+            f"- {name}: {' '.join(persona.split())}" for name, persona in zip(names, personas)
+        )
+    
+    def _build_shared_prefix(self, enhanced_prompt, roster):
+        """Build the study brief and participant roster shared by every section request
+        
+        It is sent as the system prefix, identical across sections, so providers can cache it.
+        """
+        
+        return f"""{enhanced_prompt}
+
+PARTICIPANTS (use exactly these names throughout):
+- MODERATOR
+{roster}
+"""
+    
+    def _build_section_prompt(self, index, estimated_words, previous_text=""):
+        """Build the section-specific instructions for a single transcript section"""
+        
+        name, ratio, outline = TRANSCRIPT_SECTIONS[index]
+        
+        section_prompt = f"""SECTION TO WRITE NOW: {index + 1}. {name} (~{int(estimated_words * ratio):,} words)
+- Cover: {outline}
+- Write only this section; the other sections of the transcript are written separately
+- Do not repeat introductions or wrap up the discussion unless this section calls for it
+"""
+        
+        if previous_text:
+            section_prompt += f"""
+THE PREVIOUS SECTION ENDED WITH:
+{previous_text}
+
+Continue naturally from this point.
+"""
+        
+        return section_prompt
+    
+    def finalize_transcript(self, transcript, form_data):
+        """Validate and post-process a raw transcript returned by the AI provider"""
+        
+        if not transcript:
+            raise Exception("Failed to generate transcript")
+        
+        return self._post_process_transcript(transcript, form_data)
+    
+    def _prepare_generation(self, form_data, api_config, generated_prompt):
+        """Initialize the configured AI provider and build the research-enhanced prompt
+        
+        Returns the provider's chat model, which the manager's generation methods take, and the prompt.
+        """
+        
+        # Initialize AI provider
+        provider_name = api_config['provider']
+        api_key = api_config['api_key']
+        model = api_config['model']
+        
+        provider = self.ai_manager.initialize_provider(provider_name, api_key, model)  # Raises GenerationError on failure
+        
+        # Enhance prompt with research data
+        enhanced_prompt = self._enhance_prompt_with_research(generated_prompt, form_data)
+        
+        return provider, enhanced_prompt
+    
+    def _enhance_prompt_with_research(self, base_prompt, form_data):
+        """Enhance the prompt with research data about the topic and location"""
+        
+        # Memoized per prompt and study, so batch variants sharing a study render it once
+        return _research_enhanced_prompt(base_prompt, form_data_key(form_data))
     
     def _post_process_transcript(self, transcript, form_data):
         """Post-process the generated transcript for quality and consistency"""
         
+        return self._post_process_lines(transcript.splitlines(), form_data)
+    
+    def _post_process_lines(self, lines, form_data):
+        """Post-process transcript lines, consumed lazily so they can come straight from a stream"""
+        
         # Add header information
         header = self._generate_transcript_header(form_data)
         
-        # Clean up formatting
-        cleaned_transcript = self._clean_transcript_formatting(transcript)
+        # Clean up formatting and add timestamps if missing, streaming the lines through both steps
+        cleaned_lines = self._clean_transcript_formatting(lines)
+        timestamped_lines = self._add_timestamps(cleaned_lines, form_data['duration'])
         
-        # Add timestamps if missing
-        timestamped_transcript = self._add_timestamps(cleaned_transcript, form_data['duration'])
+        # Count words as the lines come out of the pipeline, so the transcript is only joined once
+        final_lines = []
+        actual_words = 0
+        for line in timestamped_lines:
+            final_lines.append(line)
+            actual_words += count_words(line)
         
         # Validate word count
-        final_transcript = self._adjust_word_count(timestamped_transcript, form_data)
+        final_transcript = self._adjust_word_count('\n'.join(final_lines), form_data, actual_words)
         
         return header + "\n\n" + final_transcript
     
@@ -281,89 +605,47 @@ ADDITIONAL INSTRUCTIONS:
         current_date = datetime.now().strftime("%B %d, %Y")
         estimated_words = calculate_word_count(form_data['duration'])
         
-        header = f"""FOCUS GROUP DISCUSSION TRANSCRIPT
-
-Study Information:
-- Topic: {form_data['topic']}
-- Date: {current_date}
-- Duration: {form_data['duration']} minutes
-- Location: {form_data['location']}
-- Type: {form_data['discussion_type'].upper()}
-- Languages: {', '.join(form_data['languages'])}
-
-Participant Demographics:
-- Total Participants: {form_data['num_participants']}
-- Gender Distribution: {form_data['male_count']}M, {form_data['female_count']}F, {form_data['non_binary_count']}NB
-- Age Range: {form_data['age_range']}
-- Profile: {form_data['demographics']}
-
-Study Objective:
-{form_data['objective']}
-
-Expected Word Count: ~{estimated_words:,} words
-Transcript Status: Generated using AI simulation
-
-{'='*80}"""
-        
-        return header
+        return TRANSCRIPT_HEADER.format_map({
+            **form_data,
+            'date': current_date,
+            'discussion_type_upper': form_data['discussion_type'].upper(),
+            'languages_joined': ', '.join(form_data['languages']),
+            'estimated_words': estimated_words
+        })
     
-    def _clean_transcript_formatting(self, transcript):
-        """Clean up transcript formatting"""
-        
-        lines = transcript.split('\n')
-        cleaned_lines = []
+    def _clean_transcript_formatting(self, lines):
+        """Clean up transcript formatting, yielding each line trimmed of surrounding whitespace"""
         
         for line in lines:
-            line = line.strip()
-            if not line:
-                cleaned_lines.append('')
-                continue
-                
-            # Standardize speaker identification
-            if line.startswith('[') and ']' in line:
-                # Timestamp line
-                cleaned_lines.append(line)
-            elif ':' in line and any(marker in line.upper() for marker in ['MODERATOR', 'P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8', 'PARTICIPANT']):
-                # Speaker line
-                cleaned_lines.append(line)
-            else:
-                # Regular content
-                cleaned_lines.append(line)
-        
-        return '\n'.join(cleaned_lines)
+            yield line.strip()
     
-    def _add_timestamps(self, transcript, duration):
-        """Add or fix timestamps in transcript"""
+    def _add_timestamps(self, lines, duration):
+        """Add or fix timestamps in transcript lines, yielding each line as it is processed"""
         
-        lines = transcript.split('\n')
-        timestamped_lines = []
+        bracketed_count = 0  # Output lines starting with '[', counted as they are emitted
         current_time = 0
         time_increment = max(1, duration // 20)  # Roughly 20 timestamps throughout
         
         for line in lines:
-            if line.strip().startswith('[') and ']' in line and any(char.isdigit() for char in line):
+            if _TS_RE.match(line):
                 # Already has timestamp
-                timestamped_lines.append(line)
-            elif ':' in line and any(marker in line.upper() for marker in ['MODERATOR', 'P1', 'P2', 'P3', 'P4', 'P5', 'P6', 'P7', 'P8']):
+                pass
+            elif ':' in line and _SPEAKER_RE.search(line):
                 # Speaker line - add timestamp occasionally
-                if current_time == 0 or len([l for l in timestamped_lines if l.startswith('[')]) < current_time // time_increment:
+                if current_time == 0 or bracketed_count < current_time // time_increment:
                     minutes = current_time // 60
                     seconds = current_time % 60
-                    timestamp = f"[{minutes:02d}:{seconds:02d}] "
-                    timestamped_lines.append(timestamp + line)
+                    line = f"[{minutes:02d}:{seconds:02d}] " + line
                     current_time += time_increment
-                else:
-                    timestamped_lines.append(line)
-            else:
-                timestamped_lines.append(line)
-        
-        return '\n'.join(timestamped_lines)
+            
+            if line.startswith('['):
+                bracketed_count += 1
+            yield line
     
-    def _adjust_word_count(self, transcript, form_data):
-        """Adjust transcript to match expected word count"""
+    def _adjust_word_count(self, transcript, form_data, actual_words):
+        """Adjust transcript to match expected word count, given the words it already contains"""
         
         expected_words = calculate_word_count(form_data['duration'])
-        actual_words = len(transcript.split())
         
         # If significantly different, add note
         word_ratio = actual_words / expected_words if expected_words > 0 else 1
@@ -389,44 +671,45 @@ Transcript Status: Generated using AI simulation
             'cultural_references': False
         }
         
-        lines = transcript.split('\n')
-        word_count = len(transcript.split())
+        word_count = count_words(transcript)
         expected_words = calculate_word_count(form_data['duration'])
         
-        # Check for moderator presence
-        moderator_lines = [l for l in lines if 'MODERATOR' in l.upper()]
-        quality_checks['has_moderator'] = len(moderator_lines) > 0
-        
-        # Check for participants
-        participant_lines = [l for l in lines if any(p in l.upper() for p in ['P1', 'P2', 'P3', 'PARTICIPANT'])]
-        quality_checks['has_participants'] = len(participant_lines) > 0
-        
-        # Check for timestamps
-        timestamp_lines = [l for l in lines if l.strip().startswith('[') and ']' in l and any(c.isdigit() for c in l)]
-        quality_checks['has_timestamps'] = len(timestamp_lines) > 2
-        
-        # Check for opening and closing
-        transcript_lower = transcript.lower()
-        opening_keywords = ['welcome', 'introduction', 'begin', 'start', 'good morning', 'good evening']
-        closing_keywords = ['thank you', 'conclude', 'wrap up', 'final thoughts', 'end']
-        
-        quality_checks['has_opening'] = any(keyword in transcript_lower[:500] for keyword in opening_keywords)
-        quality_checks['has_closing'] = any(keyword in transcript_lower[-500:] for keyword in closing_keywords)
+        # Check for moderator, participants and timestamps in one pass, stopping once all are settled
+        timestamp_count = 0
+        for line in transcript.splitlines():
+            if not quality_checks['has_moderator'] and _MODERATOR_RE.search(line):
+                quality_checks['has_moderator'] = True
+            if not quality_checks['has_participants'] and _PARTICIPANT_RE.search(line):
+                quality_checks['has_participants'] = True
+            if timestamp_count <= 2 and _TS_RE.match(line):
+                timestamp_count += 1
+            if quality_checks['has_moderator'] and quality_checks['has_participants'] and timestamp_count > 2:
+                break
+        quality_checks['has_timestamps'] = timestamp_count > 2
+        
+        # Check for opening and closing; only the scanned windows are lowercased
+        head_lower = transcript[:500].lower()
+        tail_lower = transcript[-500:].lower()
+        
+        quality_checks['has_opening'] = any(keyword in head_lower for keyword in _OPENING_KEYWORDS)
+        quality_checks['has_closing'] = any(keyword in tail_lower for keyword in _CLOSING_KEYWORDS)
         
         # Check appropriate length (within 30% of expected)
         quality_checks['appropriate_length'] = 0.7 <= (word_count / expected_words) <= 1.3
         
-        # Check for natural flow indicators
-        natural_indicators = ['umm', 'uh', 'you know', 'like', 'actually', 'i think', 'well']
-        quality_checks['natural_flow'] = any(indicator in transcript_lower for indicator in natural_indicators)
-        
-        # Check for cultural references (simplified)
+        # Check for natural flow indicators and cultural references (simplified) in one scan
         location = form_data.get('location', '').lower()
-        if 'india' in location or 'mumbai' in location or 'delhi' in location:
-            cultural_words = ['yaar', 'na', 'arre', 'bas', 'tension', 'time pass']
-            quality_checks['cultural_references'] = any(word in transcript_lower for word in cultural_words)
-        else:
-            quality_checks['cultural_references'] = True  # Assume present for other locations
+        needs_indian = 'india' in location or 'mumbai' in location or 'delhi' in location
+        wanted = {'natural', 'indian'} if needs_indian else {'natural'}
+        found = set()
+        for match in _SPEECH_MARKERS_RE.finditer(transcript):
+            found.add(match.lastgroup)
+            if wanted <= found:
+                break
+        
+        quality_checks['natural_flow'] = 'natural' in found
+        # Assume cultural references are present for other locations
+        quality_checks['cultural_references'] = 'indian' in found if needs_indian else True
         
         # Calculate quality score
         passed_checks = sum(quality_checks.values())
@@ -474,57 +757,8 @@ Transcript Status: Generated using AI simulation
         
         return recommendations
 
-class PromptTemplateManager:
-    """Manages and generates prompts for different scenarios"""
-    
-    def __init__(self):
-        self.base_templates = {
-            'standard': self._get_standard_template(),
-            'business': self._get_business_template(),
-            'consumer': self._get_consumer_template(),
-            'healthcare': self._get_healthcare_template(),
-            'technology': self._get_technology_template()
-        }
-    
-    def generate_enhanced_prompt(self, form_data, base_prompt=""):
-        """Generate an enhanced prompt based on form data and topic analysis"""
-        
-        topic = form_data.get('topic', '').lower()
-        
-        # Determine best template based on topic
-        template_type = self._classify_topic(topic)
-        template = self.base_templates.get(template_type, self.base_templates['standard'])
-        
-        # Customize template with form data
-        customized_prompt = self._customize_template(template, form_data)
-        
-        # Add base prompt if provided
-        if base_prompt:
-            customized_prompt = base_prompt + "\n\n" + customized_prompt
-        
-        return customized_prompt
-    
-    def _classify_topic(self, topic):
-        """Classify topic to determine appropriate template"""
-        
-        business_keywords = ['market', 'business', 'strategy', 'sales', 'revenue', 'b2b']
-        consumer_keywords = ['consumer', 'customer', 'shopping', 'purchase', 'brand', 'product']
-        healthcare_keywords = ['health', 'medical', 'hospital', 'doctor', 'patient', 'wellness']
-        technology_keywords = ['technology', 'app', 'software', 'digital', 'ai', 'tech', 'platform']
-        
-        if any(keyword in topic for keyword in business_keywords):
-            return 'business'
-        elif any(keyword in topic for keyword in consumer_keywords):
-            return 'consumer'
-        elif any(keyword in topic for keyword in healthcare_keywords):
-            return 'healthcare'
-        elif any(keyword in topic for keyword in technology_keywords):
-            return 'technology'
-        else:
-            return 'standard'
-    
-    def _get_standard_template(self):
-        return """
+# Prompt skeletons for PromptTemplateManager, built once at import time
+_STANDARD_TMPL = """
 FOCUS GROUP STRUCTURE GUIDELINES:
 
 1. OPENING PHASE (15% of discussion):
@@ -560,9 +794,8 @@ MODERATOR TECHNIQUES:
 - Maintain neutrality
 - Use active listening techniques
         """
-    
-    def _get_business_template(self):
-        return self._get_standard_template() + """
+
+_BUSINESS_TMPL = _STANDARD_TMPL + """
 
 BUSINESS FOCUS GROUP SPECIFICS:
 - Explore decision-making processes
@@ -572,9 +805,8 @@ BUSINESS FOCUS GROUP SPECIFICS:
 - Explore competitive landscape awareness
 - Focus on practical business implications
         """
-    
-    def _get_consumer_template(self):
-        return self._get_standard_template() + """
+
+_CONSUMER_TMPL = _STANDARD_TMPL + """
 
 CONSUMER FOCUS GROUP SPECIFICS:
 - Explore emotional connections to products/brands
@@ -584,9 +816,8 @@ CONSUMER FOCUS GROUP SPECIFICS:
 - Explore unmet needs and pain points
 - Focus on user experience and satisfaction
         """
-    
-    def _get_healthcare_template(self):
-        return self._get_standard_template() + """
+
+_HEALTHCARE_TMPL = _STANDARD_TMPL + """
 
 HEALTHCARE FOCUS GROUP SPECIFICS:
 - Handle sensitive topics with care
@@ -597,9 +828,8 @@ HEALTHCARE FOCUS GROUP SPECIFICS:
 - Focus on health outcomes and quality of life
 - Be mindful of regulatory and ethical considerations
         """
-    
-    def _get_technology_template(self):
-        return self._get_standard_template() + """
+
+_TECHNOLOGY_TMPL = _STANDARD_TMPL + """
 
 TECHNOLOGY FOCUS GROUP SPECIFICS:
 - Explore user experience and interface preferences
@@ -610,11 +840,31 @@ TECHNOLOGY FOCUS GROUP SPECIFICS:
 - Focus on learning curves and support needs
 - Consider generational and technical skill differences
         """
+
+# Topic keywords per template type, matched as substrings of the lowercased topic
+_BUSINESS_KW = frozenset({'market', 'business', 'strategy', 'sales', 'revenue', 'b2b'})
+_CONSUMER_KW = frozenset({'consumer', 'customer', 'shopping', 'purchase', 'brand', 'product'})
+_HEALTHCARE_KW = frozenset({'health', 'medical', 'hospital', 'doctor', 'patient', 'wellness'})
+_TECHNOLOGY_KW = frozenset({'technology', 'app', 'software', 'digital', 'ai', 'tech', 'platform'})
+
+# (keyword, template type) in template priority order; the first keyword found in the topic decides
+_TOPIC_KEYWORDS = tuple(
+    (keyword, template_type)
+    for template_type, keywords in (
+        ('business', _BUSINESS_KW),
+        ('consumer', _CONSUMER_KW),
+        ('healthcare', _HEALTHCARE_KW),
+        ('technology', _TECHNOLOGY_KW)
+    )
+    for keyword in keywords
+)
+
+@lru_cache(maxsize=256)
+def _customize_template(template, form_items):
+    """Customize template with specific form data, given as form_data_key(form_data)"""
     
-    def _customize_template(self, template, form_data):
-        """Customize template with specific form data"""
-        
-        customizations = f"""
+    form_data = dict(form_items)
+    customizations = f"""
 STUDY-SPECIFIC CUSTOMIZATIONS:
 
 Topic: {form_data.get('topic', 'Not specified')}
@@ -641,43 +891,80 @@ CULTURAL AND LINGUISTIC REQUIREMENTS:
 - Reflect authentic regional communication styles
 
         """
+    
+    return template + customizations
+
+class PromptTemplateManager:
+    """Manages and generates prompts for different scenarios"""
+    
+    def __init__(self):
+        self.base_templates = {
+            'standard': _STANDARD_TMPL,
+            'business': _BUSINESS_TMPL,
+            'consumer': _CONSUMER_TMPL,
+            'healthcare': _HEALTHCARE_TMPL,
+            'technology': _TECHNOLOGY_TMPL
+        }
+    
+    def generate_enhanced_prompt(self, form_data, base_prompt=""):
+        """Generate an enhanced prompt based on form data and topic analysis"""
+        
+        topic = form_data.get('topic', '').lower()
+        
+        # Determine best template based on topic
+        template_type = self._classify_topic(topic)
+        template = self.base_templates.get(template_type, self.base_templates['standard'])
+        
+        # Customize template with form data (memoized per template and study)
+        customized_prompt = _customize_template(template, form_data_key(form_data))
+        
+        # Add base prompt if provided
+        if base_prompt:
+            customized_prompt = base_prompt + "\n\n" + customized_prompt
+        
+        return customized_prompt
+    
+    def _classify_topic(self, topic):
+        """Classify topic to determine appropriate template"""
         
-        return template + customizations
+        for keyword, template_type in _TOPIC_KEYWORDS:
+            if keyword in topic:
+                return template_type
+        return 'standard'
 
 # Additional utility functions for transcript generation
 
 def simulate_realistic_timing(base_transcript, duration_minutes):
     """Add realistic timing patterns to transcript"""
     
-    lines = base_transcript.split('\n')
-    timed_lines = []
+    lines = base_transcript.splitlines()
     
     # Calculate timing distribution
     total_seconds = duration_minutes * 60
-    content_lines = [l for l in lines if l.strip() and not l.startswith('[')]
+    content_count = sum(1 for l in lines if l.strip() and not l.startswith('['))
     
-    if not content_lines:
+    if not content_count:
         return base_transcript
     
     # Distribute time across content
-    time_per_line = total_seconds / len(content_lines)
-    current_time = 0
-    
-    for line in lines:
-        if line.strip() and not line.startswith('['):
-            # Add timestamp every few exchanges
-            if current_time == 0 or current_time % 300 == 0:  # Every 5 minutes
-                minutes = int(current_time // 60)
-                seconds = int(current_time % 60)
-                timestamp = f"[{minutes:02d}:{seconds:02d}]"
-                timed_lines.append(timestamp)
-            
-            timed_lines.append(line)
-            current_time += time_per_line
-        else:
-            timed_lines.append(line)
+    time_per_line = total_seconds / content_count
+    
+    def timed_lines():
+        current_time = 0
+        for line in lines:
+            if line.strip() and not line.startswith('['):
+                # Add timestamp every few exchanges
+                if current_time == 0 or current_time % 300 == 0:  # Every 5 minutes
+                    minutes = int(current_time // 60)
+                    seconds = int(current_time % 60)
+                    yield f"[{minutes:02d}:{seconds:02d}]"
+                
+                yield line
+                current_time += time_per_line
+            else:
+                yield line
     
-    return '\n'.join(timed_lines)
+    return '\n'.join(timed_lines())
 
 def add_natural_speech_patterns(transcript, languages, location):
     """Add natural speech patterns and hesitations"""
@@ -685,13 +972,6 @@ def add_natural_speech_patterns(transcript, languages, location):
     # This would be more sophisticated in production
     # For now, we'll add basic patterns
     
-    natural_markers = {
-        'english': ['um', 'uh', 'you know', 'like', 'actually'],
-        'hinglish': ['na', 'yaar', 'arre', 'bas'],
-        'french': ['euh', 'ben', 'alors'],
-        'spanish': ['pues', 'este', 'bueno']
-    }
-    
     # Add occasional hesitations and natural speech markers
     # This is a simplified implementation
     return transcript
@@ -699,48 +979,25 @@ def add_natural_speech_patterns(transcript, languages, location):
 def generate_participant_names(count, location, gender_distribution):
     """Generate appropriate participant names for the location"""
     
-    name_pools = {
-        'india': {
-            'male': ['Amit', 'Rajesh', 'Vikram', 'Suresh', 'Kiran', 'Arjun', 'Rohit', 'Deepak'],
-            'female': ['Priya', 'Sneha', 'Kavita', 'Pooja', 'Meera', 'Sunita', 'Anita', 'Ritu'],
-            'surnames': ['Sharma', 'Patel', 'Singh', 'Kumar', 'Gupta', 'Agarwal', 'Jain', 'Shah']
-        },
-        'france': {
-            'male': ['Pierre', 'Jean', 'Michel', 'Alain', 'Philippe', 'Christophe', 'Laurent', 'Éric'],
-            'female': ['Marie', 'Françoise', 'Monique', 'Catherine', 'Sylvie', 'Isabelle', 'Martine', 'Nicole'],
-            'surnames': ['Martin', 'Bernard', 'Dubois', 'Thomas', 'Robert', 'Petit', 'Durand', 'Leroy']
-        },
-        'usa': {
-            'male': ['John', 'Michael', 'David', 'James', 'Robert', 'William', 'Richard', 'Joseph'],
-            'female': ['Mary', 'Patricia', 'Jennifer', 'Linda', 'Elizabeth', 'Barbara', 'Susan', 'Jessica'],
-            'surnames': ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis']
-        }
-    }
-    
     # Determine appropriate name pool based on location
     location_lower = location.lower()
     if 'india' in location_lower:
-        pool = name_pools['india']
+        pool = NAME_POOLS['india']
     elif 'france' in location_lower or 'paris' in location_lower:
-        pool = name_pools['france']
+        pool = NAME_POOLS['france']
     else:
-        pool = name_pools['usa']  # Default
-    
-    # Generate names based on gender distribution
-    names = []
-    male_count = gender_distribution.get('male', 0)
-    female_count = gender_distribution.get('female', 0)
-    
-    # Add male names
-    for i in range(male_count):
-        first_name = pool['male'][i % len(pool['male'])]
-        surname = pool['surnames'][i % len(pool['surnames'])]
-        names.append(f"{first_name} {surname}")
-    
-    # Add female names
-    for i in range(female_count):
-        first_name = pool['female'][i % len(pool['female'])]
-        surname = pool['surnames'][(i + male_count) % len(pool['surnames'])]
-        names.append(f"{first_name} {surname}")
-    
-    return names[:count]
\ No newline at end of file
+        pool = NAME_POOLS['usa']  # Default
+    
+    # Generate names based on gender distribution, only as many as will be kept
+    male_count = min(gender_distribution.get('male', 0), count)
+    female_count = min(gender_distribution.get('female', 0), count - male_count)
+    surnames = pool['surnames']
+    
+    # Pair cycled first names with cycled surnames; female surnames continue where the male ones stopped
+    male_pairs = zip(cycle(pool['male']), cycle(surnames))
+    female_pairs = zip(cycle(pool['female']), islice(cycle(surnames), male_count % len(surnames), None))
+    
+    return [
+        f"{first_name} {surname}"
+        for first_name, surname in chain(islice(male_pairs, male_count), islice(female_pairs, female_count))
+    ]
\ No newline at end of file
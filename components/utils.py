@@ -4,12 +4,18 @@ Utility functions for the Focus Group Generator
 
 import re
 import io
+from functools import lru_cache
 import streamlit as st
-from docx import Document
-from docx.shared import Inches
-import PyPDF2
-import mammoth
 
+# Transcript sections as (name, share of total words, what the section covers)
+TRANSCRIPT_SECTIONS = (
+    ('Opening', 0.15, 'Welcome and introductions, ground rules and recording consent, overview of discussion'),
+    ('Warm-up', 0.10, 'Icebreaker questions, general topic introduction'),
+    ('Core Discussion', 0.65, 'Main research questions, deep probing and follow-ups, natural participant interactions'),
+    ('Closing', 0.10, 'Summary of key points, final thoughts, thank you and wrap-up')
+)
+
+@lru_cache(maxsize=256)
 def calculate_word_count(duration_minutes):
     """
     Calculate estimated word count based on scientific research
@@ -27,6 +33,26 @@ def calculate_word_count(duration_minutes):
     
     return total_words
 
+_WORD_RE = re.compile(r"\S+")
+
+def count_words(text):
+    """
+    Count whitespace-separated words without building a list of them
+    """
+    return sum(1 for _ in _WORD_RE.finditer(text))
+
+@lru_cache(maxsize=256)
+def calculate_section_breakdown(estimated_words):
+    """
+    Split an estimated word count across the transcript sections
+    
+    Returns a tuple of (section label, words, percentage) rows.
+    """
+    return tuple(
+        (f"{name} ({share:.0%})", int(estimated_words * share), f"{share:.0%}")
+        for name, share, _ in TRANSCRIPT_SECTIONS
+    )
+
 def validate_api_key(provider, api_key):
     """
     Validate API key format for different providers
@@ -66,10 +92,16 @@ Location: {form_data.get('location', 'Not specified')}
     
     return header + transcript
 
+@st.cache_data(show_spinner=False)
 def export_to_docx(transcript, form_data):
     """
     Export transcript to DOCX format with proper formatting
+    
+    Cached on the transcript and form data, so the document is built once per
+    transcript instead of on every rerun of the results page.
     """
+    from docx import Document  # Imported on first export to keep app start-up fast
+    
     doc = Document()
     
     # Add title
@@ -101,10 +133,9 @@ def export_to_docx(transcript, form_data):
     doc.add_heading('Transcript', level=1)
     
     # Split transcript into paragraphs and format appropriately
-    lines = transcript.split('\n')
     current_paragraph = ""
     
-    for line in lines:
+    for line in transcript.splitlines():
         line = line.strip()
         if not line:
             if current_paragraph:
@@ -141,39 +172,49 @@ def process_uploaded_file(uploaded_file):
     if uploaded_file is None:
         return ""
     
-    file_extension = uploaded_file.name.split('.')[-1].lower()
-    
     try:
-        if file_extension == 'txt':
-            # Plain text file
-            content = uploaded_file.read().decode('utf-8')
+        return extract_document_text(uploaded_file.name, uploaded_file.getvalue())
+    except Exception as e:
+        st.error(f"Error processing file: {str(e)}")
+        return ""
+
+@st.cache_data(show_spinner="Parsing document…")
+def extract_document_text(file_name, file_bytes):
+    """
+    Extract text from an uploaded document's bytes
+    
+    Cached on the file name and contents, so reruns with the same upload
+    return immediately instead of re-parsing the document.
+    """
+    import PyPDF2
+    import mammoth
+    
+    file_extension = file_name.split('.')[-1].lower()
+    
+    if file_extension == 'txt':
+        # Plain text file
+        content = file_bytes.decode('utf-8')
+        
+    elif file_extension == 'pdf':
+        # PDF file
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
+        content = "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
             
-        elif file_extension == 'pdf':
-            # PDF file
-            pdf_reader = PyPDF2.PdfReader(uploaded_file)
-            content = ""
-            for page in pdf_reader.pages:
-                content += page.extract_text() + "\n"
-                
-        elif file_extension in ['docx', 'doc']:
-            # Word document
-            if file_extension == 'docx':
-                result = mammoth.extract_raw_text(uploaded_file)
-                content = result.value
-            else:
-                # For .doc files, we'll need python-docx2txt or similar
-                st.warning("DOC files not fully supported. Please use DOCX format.")
-                content = ""
-                
+    elif file_extension in ['docx', 'doc']:
+        # Word document
+        if file_extension == 'docx':
+            result = mammoth.extract_raw_text(io.BytesIO(file_bytes))
+            content = result.value
         else:
-            st.error(f"Unsupported file format: {file_extension}")
+            # For .doc files, we'll need python-docx2txt or similar
+            st.warning("DOC files not fully supported. Please use DOCX format.")
             content = ""
             
-        return content.strip()
+    else:
+        st.error(f"Unsupported file format: {file_extension}")
+        content = ""
         
-    except Exception as e:
-        st.error(f"Error processing file: {str(e)}")
-        return ""
+    return content.strip()
 
 def get_language_recommendations(selected_languages):
     """
@@ -216,19 +257,36 @@ def get_language_recommendations(selected_languages):
     
     return recommendations
 
+@st.cache_data(show_spinner=False)
+@st.cache_data(show_spinner=False)
+def search_transcript_lines(transcript, search_term):
+    """
+    Return only the transcript lines matching a search term, highlighted for markdown display
+    """
+    pattern = _search_pattern(search_term)
+    return [pattern.sub(r"**\1**", line) for line in transcript.splitlines() if pattern.search(line)]
+
+@lru_cache(maxsize=32)
+def _search_pattern(search_term):
+    # Lookarounds instead of \b so terms that start or end with punctuation still match
+    return re.compile(rf"(?<!\w)({re.escape(search_term)})(?!\w)", re.IGNORECASE)
+
 def format_transcript_preview(transcript, max_lines=20):
     """
     Format transcript for preview display
     """
-    lines = transcript.split('\n')
+    # Count and cut at newlines instead of splitting the whole transcript into a list
+    line_count = transcript.count('\n') + 1
     
-    if len(lines) <= max_lines:
+    if line_count <= max_lines:
         return transcript
     
-    preview_lines = lines[:max_lines]
-    preview = '\n'.join(preview_lines)
+    preview_end = -1
+    for _ in range(max_lines):
+        preview_end = transcript.index('\n', preview_end + 1)
+    preview = transcript[:preview_end]
     
-    remaining_lines = len(lines) - max_lines
+    remaining_lines = line_count - max_lines
     preview += f"\n\n... ({remaining_lines} more lines)"
     
     return preview